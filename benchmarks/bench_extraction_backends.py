@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark the thread and process extraction backends
+Runs search_and_extract at 1/8/32 concurrent requests with caching disabled
+
+Usage:
+    python benchmarks/bench_extraction_backends.py            # synthetic CPU-bound extraction
+    python benchmarks/bench_extraction_backends.py --live     # real yt-dlp against YouTube
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+# Keep per-request log lines out of the timings
+logging.getLogger().setLevel(logging.WARNING)
+
+LIVE_QUERIES = ["tum hi ho", "shape of you", "kesariya", "believer", "lofi hip hop"]
+
+@functools.lru_cache(maxsize=1)
+def _synthetic_payload() -> str:
+    """A yt-dlp sized info dict (~150 formats, a few hundred KB of JSON)"""
+    formats = []
+    for i in range(150):
+        formats.append({
+            "format_id": str(100 + i),
+            "url": f"https://rr1---sn-abc.googlevideo.com/videoplayback?expire=1999999999&itag={i}"
+                   f"&n={'x' * 40}&sig={'y' * 120}&mime=audio%2Fwebm&clen={i * 1000}",
+            "ext": ["m4a", "webm", "mp4"][i % 3],
+            "acodec": "none" if i % 4 == 0 else "opus",
+            "vcodec": "none" if i % 2 else "avc1.4d401e",
+            "abr": (i % 9) * 16,
+            "http_headers": {"User-Agent": "Mozilla/5.0", "Accept": "*/*"},
+            "fragments": [{"path": f"sq/{n}", "duration": 5.0} for n in range(10)],
+        })
+    thumbnails = [{"url": f"https://i.ytimg.com/vi/abc/{n}.jpg", "width": n * 16, "height": n * 9}
+                  for n in range(1, 40)]
+    return json.dumps({
+        "id": "dQw4w9WgXcQ",
+        "title": "Synthetic Track",
+        "duration": 213,
+        "formats": formats,
+        "thumbnails": thumbnails,
+        "description": "lorem ipsum " * 500,
+    })
+
+def _stub_extract_info(url: str, opts: dict) -> dict:
+    """CPU-bound stand-in for yt-dlp: JSON parsing, regexes and a small interpreter loop"""
+    if opts.get("extract_flat"):
+        # Flat search: every synthetic query gets its own video
+        return {"entries": [{"id": f"syn{abs(hash(url)) % 10 ** 8:08d}"}]}
+    payload = _synthetic_payload()
+    info = json.loads(payload)
+    for f in info["formats"]:
+        # Signature / n-parameter style string work
+        sig = re.search(r"sig=([^&]+)", f["url"]).group(1)
+        acc = 0
+        for ch in sig:
+            acc = (acc * 31 + ord(ch)) & 0xFFFFFFFF
+        f["url"] = re.sub(r"sig=[^&]+", f"sig={acc:x}", f["url"])
+    return info
+
+def install_stub():
+    """Pool initializer: swap yt-dlp for the synthetic workload in this worker"""
+    main.extractor._extract_info = _stub_extract_info
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_level(concurrency: int, requests: int, live: bool) -> dict:
+    counter = iter(range(requests))
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for i in counter:
+            # Distinct synthetic queries keep request coalescing out of the measurement
+            query = LIVE_QUERIES[i % len(LIVE_QUERIES)] if live else f"synthetic query {i}"
+            start = time.perf_counter()
+            try:
+                await main.extractor.search_and_extract(query)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+async def run_backend(backend: str, workers: int, levels: list, live: bool) -> list:
+    main.extractor.cache = main.ResultCache(0, 0, 0, 0)
+    main.extractor.search_cache = main.ResultCache(0, 0, 0, 0)
+    main.extractor.shared_cache = None
+    main.extractor.executor = main.ExtractionExecutor(
+        max_workers=workers,
+        max_queue=10_000,
+        retry_after=1,
+        backend=backend,
+        initializer=None if live else install_stub
+    )
+    await main.extractor.executor.start()
+    try:
+        results = []
+        for concurrency in levels:
+            requests = len(LIVE_QUERIES) * 2 if live else max(32, concurrency * 4)
+            results.append(await run_level(concurrency, requests, live))
+        return results
+    finally:
+        main.extractor.executor.shutdown()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="use real yt-dlp (needs network)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="pool size")
+    parser.add_argument("--levels", default="1,8,32", help="comma separated concurrency levels")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    print(f"🧪 Extraction backend benchmark ({'live yt-dlp' if args.live else 'synthetic'}, "
+          f"{args.workers} workers, {os.cpu_count()} CPUs)")
+    print("=" * 72)
+    print(f"{'backend':<9}{'conc':>6}{'reqs':>6}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for backend in ("thread", "process"):
+        for r in asyncio.run(run_backend(backend, args.workers, levels, args.live)):
+            print(f"{backend:<9}{r['concurrency']:>6}{r['requests']:>6}{r['errors']:>8}"
+                  f"{r['throughput']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['mean_ms']:>10.1f}")
+
+if __name__ == "__main__":
+    main_cli()
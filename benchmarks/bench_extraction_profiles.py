@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Compare the "full" and "fast" extraction profiles on latency and bytes fetched
+Replays recorded yt-dlp HTTP exchanges, so runs are repeatable and need no network
+
+Usage:
+    python benchmarks/bench_extraction_profiles.py --record VIDEO_URL   # capture both profiles
+    python benchmarks/bench_extraction_profiles.py [iterations]         # replay every recording
+
+Replay sleeps for each exchange's recorded upstream time, so latency covers both the
+network round trips a profile makes and yt-dlp's own parsing of the responses.
+
+No recordings are committed, and the fast profile stays experimental until one shows
+it still finds an audio format. Record with network access to YouTube first.
+"""
+
+import argparse
+import base64
+import collections
+import glob
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+from yt_dlp.networking import Response
+from yt_dlp.networking.exceptions import HTTPError
+
+import main
+
+logging.getLogger().setLevel(logging.WARNING)
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "profiles")
+
+def profile_opts(profile: str) -> dict:
+    opts = main.YouTubeAudioExtractor(profile=profile).video_opts
+    # A warm player cache on disk would hide requests from the recording
+    opts['cachedir'] = False
+    return opts
+
+def exchange_key(method: str, url: str) -> tuple:
+    """Match exchanges on method and path; query strings carry per-run nonces"""
+    parts = urllib.parse.urlsplit(url)
+    return method, parts.netloc, parts.path
+
+def record(url: str):
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
+    for profile in main.YouTubeAudioExtractor.PROFILES:
+        exchanges = []
+        ydl = yt_dlp.YoutubeDL(profile_opts(profile))
+        urlopen = ydl.urlopen
+
+        def recording_urlopen(req, urlopen=urlopen, exchanges=exchanges):
+            start = time.perf_counter()
+            try:
+                response = urlopen(req)
+                error = None
+            except HTTPError as e:
+                response, error = e.response, e
+            body = response.read()
+            method = getattr(req, 'method', None) or 'GET'
+            exchanges.append({
+                "method": method,
+                "url": response.url,
+                "request_url": req if isinstance(req, str) else req.url,
+                "status": response.status,
+                "headers": dict(response.headers.items()),
+                "body": base64.b64encode(body).decode(),
+                "elapsed": time.perf_counter() - start,
+            })
+            replayed = Response(
+                io.BytesIO(body), response.url, dict(response.headers.items()), status=response.status)
+            if error is not None:
+                raise HTTPError(replayed)
+            return replayed
+
+        ydl.urlopen = recording_urlopen
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        path = os.path.join(RECORDINGS_DIR, f"{info['id']}.{profile}.json")
+        with open(path, "w") as f:
+            json.dump({"url": url, "profile": profile, "exchanges": exchanges}, f)
+        print(f"{profile}: recorded {len(exchanges)} exchanges to {path}")
+
+def replay(recording: dict, sleep: bool) -> tuple:
+    """Run one extraction against a recording, returning (seconds, requests, bytes, result)"""
+    queues = collections.defaultdict(collections.deque)
+    for exchange in recording["exchanges"]:
+        request_url = exchange.get("request_url") or exchange["url"]
+        queues[exchange_key(exchange["method"], request_url)].append(exchange)
+
+    ydl = yt_dlp.YoutubeDL(profile_opts(recording["profile"]))
+    fetched = {"requests": 0, "bytes": 0}
+
+    def replaying_urlopen(req):
+        url = req if isinstance(req, str) else req.url
+        method = getattr(req, 'method', None) or 'GET'
+        queue = queues.get(exchange_key(method, url))
+        if not queue:
+            raise RuntimeError(f"No recorded response for {method} {url}; re-record with --record")
+        exchange = queue.popleft()
+        if sleep:
+            time.sleep(exchange["elapsed"])
+        body = base64.b64decode(exchange["body"])
+        fetched["requests"] += 1
+        fetched["bytes"] += len(body)
+        response = Response(io.BytesIO(body), exchange["url"], exchange["headers"], status=exchange["status"])
+        if exchange["status"] >= 400:
+            raise HTTPError(response)
+        return response
+
+    ydl.urlopen = replaying_urlopen
+    start = time.perf_counter()
+    info = ydl.extract_info(recording["url"], download=False)
+    result = main.extractor._format_response(info)
+    return time.perf_counter() - start, fetched["requests"], fetched["bytes"], result
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("iterations", nargs="?", type=int, default=5)
+    parser.add_argument("--record", metavar="VIDEO_URL", help="extract VIDEO_URL live under each profile and save the exchanges")
+    parser.add_argument("--no-sleep", action="store_true", help="skip the recorded upstream delays (parsing cost only)")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record)
+        return
+
+    paths = sorted(glob.glob(os.path.join(RECORDINGS_DIR, "*.json")))
+    if not paths:
+        sys.exit(f"No recordings in {RECORDINGS_DIR}; capture some with --record VIDEO_URL "
+                 f"(needs network access to YouTube)")
+
+    print(f"{'recording':<28} {'profile':<8} {'requests':>8} {'KiB':>9} {'p50 ms':>9} {'max ms':>9}  audio itag")
+    for path in paths:
+        with open(path) as f:
+            recording = json.load(f)
+        timings = []
+        for _ in range(args.iterations):
+            elapsed, requests, size, result = replay(recording, sleep=not args.no_sleep)
+            timings.append(elapsed)
+        itag = urllib.parse.parse_qs(urllib.parse.urlsplit(result["audio_url"]).query).get("itag", ["?"])[0]
+        print(f"{os.path.basename(path):<28} {recording['profile']:<8} {requests:>8} {size / 1024:>9.1f} "
+              f"{statistics.median(timings) * 1000:>9.1f} {max(timings) * 1000:>9.1f}  {itag}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for _format_response: time and peak memory per call
+Compares the single-pass selector against the previous filter-and-sort version over
+the yt-dlp info dicts in benchmarks/fixtures
+
+Usage:
+    python benchmarks/bench_format_response.py [iterations]
+    python benchmarks/bench_format_response.py --record VIDEO_URL   # save a live info dict as a fixture
+"""
+
+import argparse
+import copy
+import glob
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+logging.getLogger().setLevel(logging.WARNING)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def legacy_format_response(video_info: dict) -> dict:
+    """The filter-and-sort implementation _format_response used before the single-pass selector"""
+    audio_url = None
+    if 'formats' in video_info:
+        audio_formats = []
+        for f in video_info['formats']:
+            if not f.get('url') or f.get('acodec', 'none') == 'none':
+                continue
+            audio_formats.append(f)
+        if audio_formats:
+            def sort_key(f):
+                vcodec = f.get('vcodec', 'none')
+                abr = f.get('abr', 0) or 0
+                ext = f.get('ext', '')
+                is_audio_only = 1000 if vcodec == 'none' else 0
+                ext_bonus = 0
+                if ext in ['m4a', 'webm']:
+                    ext_bonus = 100
+                elif ext == 'mp4':
+                    ext_bonus = 50
+                return is_audio_only + ext_bonus + abr
+            audio_formats.sort(key=sort_key, reverse=True)
+            audio_url = audio_formats[0].get('url')
+    if not audio_url:
+        audio_url = video_info.get('url')
+    thumbnail = None
+    if 'thumbnails' in video_info and video_info['thumbnails']:
+        thumbnails = video_info['thumbnails']
+        thumbnails.sort(key=lambda x: (x.get('width', 0) * x.get('height', 0)), reverse=True)
+        thumbnail = thumbnails[0].get('url')
+    duration = video_info.get('duration', 0) or 0
+    return {
+        "video_id": video_info.get('id', ''),
+        "title": video_info.get('title', 'Unknown Title'),
+        "duration": int(duration),
+        "audio_url": audio_url,
+        "thumbnail": thumbnail or ""
+    }
+
+def load_fixtures() -> dict:
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.json"))):
+        with open(path) as f:
+            fixtures[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+    return fixtures
+
+def record(url: str):
+    import yt_dlp
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+    path = os.path.join(FIXTURES_DIR, f"{info['id']}.json")
+    with open(path, "w") as f:
+        json.dump(info, f, indent=1)
+    print(f"Recorded {len(info.get('formats') or [])} formats to {path}")
+
+def measure(fn, fixture: dict, iterations: int) -> tuple:
+    # Each call gets its own copy, as each request gets a fresh dict from yt-dlp;
+    # copies are made up front so only fn is timed
+    copies = [copy.deepcopy(fixture) for _ in range(iterations)]
+    timings = []
+    for info in copies:
+        start = time.perf_counter()
+        fn(info)
+        timings.append(time.perf_counter() - start)
+
+    info = copy.deepcopy(fixture)
+    tracemalloc.start()
+    fn(info)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("iterations", nargs="?", type=int, default=2000)
+    parser.add_argument("--record", metavar="VIDEO_URL", help="extract VIDEO_URL with yt-dlp and save it as a fixture")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record)
+        return
+
+    extractor = main.YouTubeAudioExtractor()
+    implementations = [("sort (previous)", legacy_format_response), ("single pass", extractor._format_response)]
+
+    print(f"{'fixture':<20} {'formats':>7} {'impl':<16} {'mean µs':>9} {'p95 µs':>9} {'peak KiB':>9}")
+    for name, fixture in load_fixtures().items():
+        expected = legacy_format_response(copy.deepcopy(fixture))
+        if extractor._format_response(copy.deepcopy(fixture)) != expected:
+            sys.exit(f"{name}: single-pass selection differs from the previous implementation")
+        for label, fn in implementations:
+            timings, peak = measure(fn, fixture, args.iterations)
+            timings.sort()
+            p95 = timings[int(0.95 * (len(timings) - 1))]
+            print(f"{name:<20} {len(fixture.get('formats') or []):>7} {label:<16} "
+                  f"{statistics.mean(timings) * 1e6:>9.1f} {p95 * 1e6:>9.1f} {peak / 1024:>9.2f}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request yt-dlp setup cost with and without the YoutubeDL pool
+Measures only setup (options, extractor registry, cookie jar, HTTP handlers); no network
+
+Usage:
+    python benchmarks/bench_ydl_pool.py [iterations]
+"""
+
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+import main
+
+logging.getLogger().setLevel(logging.WARNING)
+
+def setup_fresh(extractor: main.YouTubeAudioExtractor):
+    """What _extract_info used to do before the pool: copy options, new instance per request"""
+    opts = extractor.ydl_opts.copy()
+    opts.update({'quiet': True, 'no_warnings': True, 'default_search': 'ytsearch1:'})
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        ydl.get_info_extractor('Youtube')
+        ydl.get_info_extractor('YoutubeSearch')
+
+def setup_pooled(extractor: main.YouTubeAudioExtractor):
+    """What _extract_info does now: reuse this thread's warmed instance"""
+    ydl = extractor.ydl_pool.get(extractor.search_opts)
+    ydl.get_info_extractor('Youtube')
+    ydl.get_info_extractor('YoutubeSearch')
+
+def measure(fn, extractor, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(extractor)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    extractor = main.YouTubeAudioExtractor()
+
+    print(f"🧪 YoutubeDL setup cost per request ({iterations} iterations)")
+    print("=" * 60)
+    print(f"{'mode':<10}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}")
+    for name, fn in (("fresh", setup_fresh), ("pooled", setup_pooled)):
+        timings = measure(fn, extractor, iterations)
+        print(f"{name:<10}{statistics.mean(timings):>10.3f}{statistics.median(timings):>10.3f}{max(timings):>10.3f}")
+    print(f"\nPool stats: {extractor.ydl_pool.stats()}")
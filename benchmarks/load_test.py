@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Load test for GET /get-audio: throughput and p50/p95/p99 latency under cold, warm-cache
+and error-heavy workloads
+Runs main:app in process against an in-memory MongoDB stand-in, with yt_dlp.YoutubeDL
+swapped for a stub whose latency and failure rate are set per run. Queries, latencies and
+failures are all derived from --seed, so runs are repeatable and need no network or database.
+
+Usage:
+    python benchmarks/load_test.py                              # cold, warm and errors
+    python benchmarks/load_test.py warm --requests 2000 --concurrency 64
+    python benchmarks/load_test.py --search-ms 900 --resolve-ms 2500   # production-like yt-dlp
+    python benchmarks/load_test.py --save baseline.json          # record a baseline
+    python benchmarks/load_test.py --compare baseline.json       # exit 1 on a regression
+
+Workloads:
+    cold    every query is new, so each request runs a search and a full extraction
+    warm    queries repeat over a small, pre-warmed set and are answered from the caches
+    errors  --error-rate of searches and extractions fail (no results, unavailable videos,
+            upstream 503s), with repeats so the negative cache is exercised
+
+Default stub latencies are scaled down from production so a full run takes under a minute.
+"""
+
+import argparse
+import asyncio
+import collections
+import copy
+import functools
+import hashlib
+import json
+import logging
+import operator
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Change streams need a replica set, and hot track downloads need the network
+os.environ.setdefault("API_KEY_CACHE_WATCH", "false")
+os.environ.setdefault("HOT_TRACKS_ENABLED", "false")
+
+import httpx
+import yt_dlp
+from bson import ObjectId
+
+import main
+
+logging.getLogger().setLevel(logging.WARNING)
+# The error-heavy workload fails on purpose; one log line per failure would drown the report
+main.logger.setLevel(logging.CRITICAL)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+WORKLOADS = ("cold", "warm", "errors")
+API_KEY = "load-test-key"
+
+class MemoryCollection:
+    """Just enough of a motor collection for main.py, held in a dict keyed by _id"""
+
+    OPERATORS = {
+        "$gt": operator.gt,
+        "$gte": operator.ge,
+        "$lt": operator.lt,
+        "$lte": operator.le,
+        "$ne": operator.ne,
+    }
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.docs = {}
+        self.ops = collections.Counter()
+
+    async def _round_trip(self, op: str):
+        # Always yield, as a real driver call would
+        self.ops[op] += 1
+        await asyncio.sleep(self.latency)
+
+    @classmethod
+    def _matches(cls, doc: dict, query: dict) -> bool:
+        for field, condition in query.items():
+            value = doc.get(field)
+            if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+                for op, operand in condition.items():
+                    if op == "$exists":
+                        if (field in doc) != operand:
+                            return False
+                    elif op == "$ne":
+                        if value == operand:
+                            return False
+                    elif field not in doc or not cls.OPERATORS[op](value, operand):
+                        return False
+            elif value != condition:
+                return False
+        return True
+
+    def _find(self, query: dict):
+        key = query.get("_id")
+        if key is not None and not isinstance(key, dict):
+            doc = self.docs.get(key)
+            return doc if doc is not None and self._matches(doc, query) else None
+        return next((doc for doc in self.docs.values() if self._matches(doc, query)), None)
+
+    def _update(self, query: dict, update: dict, upsert: bool):
+        doc = self._find(query)
+        if doc is None:
+            if not upsert:
+                return
+            doc = {field: value for field, value in query.items() if not isinstance(value, dict)}
+            doc.setdefault("_id", ObjectId())
+            doc.update(copy.deepcopy(update.get("$setOnInsert", {})))
+            self.docs[doc["_id"]] = doc
+        doc.update(copy.deepcopy(update.get("$set", {})))
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+
+    def _insert(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def find_one(self, query: dict, projection: dict = None):
+        await self._round_trip("find_one")
+        doc = self._find(query)
+        if doc is None:
+            return None
+        if projection:
+            doc = {field: value for field, value in doc.items() if field == "_id" or projection.get(field)}
+        return copy.deepcopy(doc)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await self._round_trip("update_one")
+        self._update(query, update, upsert)
+
+    async def bulk_write(self, requests: list, ordered: bool = True):
+        await self._round_trip("bulk_write")
+        for request in requests:
+            # Only UpdateOne is used; pymongo keeps its arguments in private attributes
+            self._update(request._filter, request._doc, request._upsert)
+
+    async def insert_one(self, doc: dict):
+        await self._round_trip("insert_one")
+        self._insert(doc)
+
+    async def insert_many(self, docs: list, ordered: bool = True):
+        await self._round_trip("insert_many")
+        for doc in docs:
+            self._insert(doc)
+
+    async def delete_one(self, query: dict):
+        await self._round_trip("delete_one")
+        doc = self._find(query)
+        if doc is not None:
+            del self.docs[doc["_id"]]
+
+    async def create_index(self, keys, **kwargs):
+        await self._round_trip("create_index")
+        return str(keys)
+
+class MemoryDatabase:
+    """Collections are created on first access, as in MongoDB"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self.latency)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, *args, **kwargs) -> dict:
+        return {"ok": 1}
+
+class MemoryClient:
+    def __init__(self, latency: float):
+        self.admin = MemoryDatabase(0)
+        self._db = MemoryDatabase(latency)
+
+    def get_database(self) -> MemoryDatabase:
+        return self._db
+
+    def close(self):
+        pass
+
+def install_memory_db(latency: float) -> MemoryDatabase:
+    """Point main's client, and every component already holding a collection, at the stand-in"""
+    main.client = MemoryClient(latency)
+    main.db = main.client.get_database()
+    main.api_log_writer.collection = main.db.youtubeapilogs
+    main.usage_counter.collection = main.db.users
+    if main.extractor.shared_cache:
+        main.extractor.shared_cache.collection = main.db[main.SHARED_CACHE_COLLECTION]
+    if main.extractor.query_index:
+        main.extractor.query_index.collection = main.db[main.QUERY_INDEX_COLLECTION]
+    if main.job_manager.collection is not None:
+        main.job_manager.collection = main.db[main.JOBS_COLLECTION]
+    main.db.users._insert({
+        "username": "loadtest",
+        "apiKey": API_KEY,
+        "apiKeyStatus": "active",
+        "apiKeyUsageCount": 0,
+    })
+    return main.db
+
+# Worded as yt-dlp words them, so the negative cache classifies them as it would in production
+SEARCH_FAILURES = (
+    None,  # an empty result list
+    "ERROR: Unable to download API page: HTTP Error 503: Service Unavailable",
+)
+VIDEO_FAILURES = (
+    "ERROR: [youtube] {id}: Video unavailable",
+    "ERROR: [youtube] {id}: Private video. Sign in if you've been granted access to this video",
+    "ERROR: [youtube] {id}: Unable to download API page: HTTP Error 503: Service Unavailable",
+)
+
+@functools.lru_cache(maxsize=None)
+def _fixture(name: str) -> tuple:
+    """(JSON text, video id, expire= timestamp) of an info dict in benchmarks/fixtures"""
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json")) as f:
+        text = f.read()
+    info = json.loads(text)
+    expire = re.search(r"expire[=/](\d+)", text)
+    return text, info["id"], expire.group(1) if expire else None
+
+def stub_video_id(query: str) -> str:
+    return hashlib.sha1(query.encode()).hexdigest()[:11]
+
+class StubYoutubeDL:
+    """Stand-in for yt_dlp.YoutubeDL that sleeps instead of fetching and fails on a seeded schedule"""
+
+    config = {
+        "seed": 0,
+        "search_ms": 100.0,
+        "resolve_ms": 300.0,
+        "jitter": 0.5,
+        "failure_rate": 0.0,
+        "fixture": "music_video",
+    }
+
+    def __init__(self, params: dict = None):
+        self.params = dict(params or {})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    def extract_info(self, url: str, download: bool = True, **kwargs) -> dict:
+        config = self.config
+        # Seeding on the URL gives each query the same latency and outcome on every run,
+        # whatever order concurrent requests reach the pool in
+        rng = random.Random(f"{config['seed']}:{url}")
+        search = url.startswith("ytsearch")
+        latency = config["search_ms"] if search else config["resolve_ms"]
+        time.sleep(latency * (1 + config["jitter"] * (2 * rng.random() - 1)) / 1000)
+
+        video_id = stub_video_id(url.partition(":")[2]) if search else url.rpartition("v=")[2]
+        if rng.random() < config["failure_rate"]:
+            failure = rng.choice(SEARCH_FAILURES if search else VIDEO_FAILURES)
+            if failure is None:
+                return {"_type": "playlist", "entries": []}
+            raise yt_dlp.utils.DownloadError(failure.format(id=video_id))
+        if search:
+            return {"_type": "playlist", "entries": [{"id": video_id, "title": url}]}
+
+        text, fixture_id, expire = _fixture(config["fixture"])
+        text = text.replace(fixture_id, video_id)
+        if expire:
+            # Recorded URLs have long expired; a stale expire= would keep results out of the cache
+            text = text.replace(expire, str(int(time.time()) + 6 * 3600))
+        return json.loads(text)
+
+def install_stub(config: dict):
+    """Use StubYoutubeDL with config in this process; also the extraction pool initializer"""
+    StubYoutubeDL.config = config
+    yt_dlp.YoutubeDL = StubYoutubeDL
+
+async def use_stub(config: dict, args):
+    """Restart the extraction pool so every worker, thread or process, runs the stub with config"""
+    install_stub(config)
+    main.extractor.executor.shutdown()
+    main.extractor.executor = main.ExtractionExecutor(
+        max_workers=args.workers,
+        max_queue=args.max_queue,
+        retry_after=main.EXTRACTION_RETRY_AFTER,
+        backend=args.backend,
+        initializer=functools.partial(install_stub, config)
+    )
+    await main.extractor.executor.start()
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def build_queries(workload: str, args) -> tuple:
+    """(warm-up queries, measured queries) for a workload, generated from the seed"""
+    rng = random.Random(f"{args.seed}:{workload}")
+    if workload == "cold":
+        return [], [f"cold {args.seed} track {i}" for i in range(args.requests)]
+    if workload == "warm":
+        keys = [f"warm {args.seed} track {i}" for i in range(args.warm_keys)]
+        # Mixed spellings land on the same canonical key, as real traffic does
+        spellings = (str.lower, str.title, str.upper, lambda q: f"  {q}  ")
+        return keys, [rng.choice(spellings)(rng.choice(keys)) for _ in range(args.requests)]
+    distinct = [f"errors {args.seed} track {i}" for i in range(max(1, args.requests // 4))]
+    return [], [rng.choice(distinct) for _ in range(args.requests)]
+
+async def run_queries(http: httpx.AsyncClient, queries: list, concurrency: int) -> dict:
+    pending = iter(queries)
+    latencies = []
+    statuses = collections.Counter()
+    phases = collections.defaultdict(float)
+
+    async def client():
+        for query in pending:
+            start = time.perf_counter()
+            response = await http.get("/get-audio", params={"query": query})
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            for entry in response.headers.get("server-timing", "").split(","):
+                phase, _, duration = entry.strip().partition(";dur=")
+                if duration:
+                    phases[phase] += float(duration)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(queries),
+        "ok": statuses[200],
+        "statuses": dict(sorted(statuses.items())),
+        "throughput": len(queries) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "phases_ms": {
+            phase: phases[phase] / len(queries) for phase in main.SERVER_TIMING_PHASES if phase in phases
+        },
+    }
+
+async def run(args) -> dict:
+    db = install_memory_db(args.db_latency_ms / 1000)
+    results = {}
+    await main.app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app),
+            base_url="http://load-test",
+            headers={"Authorization": f"Bearer {API_KEY}"},
+            timeout=None
+        ) as http:
+            for workload in args.workloads:
+                await use_stub({
+                    "seed": args.seed,
+                    "search_ms": args.search_ms,
+                    "resolve_ms": args.resolve_ms,
+                    "jitter": args.jitter,
+                    "failure_rate": args.error_rate if workload == "errors" else args.failure_rate,
+                    "fixture": args.fixture,
+                }, args)
+                warm_up, queries = build_queries(workload, args)
+                if warm_up:
+                    await run_queries(http, warm_up, args.concurrency)
+                results[workload] = await run_queries(http, queries, args.concurrency)
+    finally:
+        await main.app.router.shutdown()
+    results["mongo_ops"] = {
+        name: dict(collection.ops) for name, collection in db._collections.items()
+    }
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Lines describing every workload whose throughput or tail latency regressed past tolerance"""
+    regressions = []
+    for workload in WORKLOADS:
+        current, before = results.get(workload), baseline.get(workload)
+        if not current or not before:
+            continue
+        if current["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{workload}: req/s {before['throughput']:.1f} -> {current['throughput']:.1f}")
+        for key in ("p95_ms", "p99_ms"):
+            if current[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{workload}: {key} {before[key]:.1f} -> {current[key]:.1f}")
+    return regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("workloads", nargs="*", metavar="workload", help=f"any of {', '.join(WORKLOADS)} (default: all)")
+    parser.add_argument("--requests", type=int, default=400, help="measured requests per workload")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--search-ms", type=float, default=100, help="stub flat search latency")
+    parser.add_argument("--resolve-ms", type=float, default=300, help="stub video extraction latency")
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency spread, as a fraction either side")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="stub failure rate for cold and warm")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="stub failure rate for errors")
+    parser.add_argument("--warm-keys", type=int, default=50, help="distinct queries in the warm workload")
+    parser.add_argument("--fixture", default="music_video", help="info dict in benchmarks/fixtures to serve")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="simulated MongoDB round trip")
+    parser.add_argument("--backend", choices=["thread", "process"], default=main.EXTRACTION_BACKEND)
+    parser.add_argument("--workers", type=int, default=main.EXTRACTION_WORKERS, help="extraction pool size")
+    parser.add_argument("--max-queue", type=int, default=main.EXTRACTION_MAX_QUEUE)
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="fail if results regress against a saved run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, as a fraction")
+    args = parser.parse_args()
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workload: {', '.join(sorted(unknown))}")
+    args.workloads = args.workloads or list(WORKLOADS)
+
+    settings = {key: value for key, value in vars(args).items() if key not in ("workloads", "save", "compare", "tolerance")}
+    print(f"🧪 /get-audio load test ({args.backend} backend, {args.workers} workers, "
+          f"concurrency {args.concurrency}, stub {args.search_ms:g}/{args.resolve_ms:g} ms, seed {args.seed})")
+    print("=" * 78)
+    results = asyncio.run(run(args))
+    results["settings"] = settings
+
+    print(f"{'workload':<10}{'reqs':>6}{'ok':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for workload in args.workloads:
+        r = results[workload]
+        statuses = " ".join(f"{code}×{count}" for code, count in r["statuses"].items())
+        print(f"{workload:<10}{r['requests']:>6}{r['ok']:>6}{r['throughput']:>9.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}  {statuses}")
+    print("\nMean Server-Timing phases (ms):")
+    for workload in args.workloads:
+        phases = results[workload]["phases_ms"]
+        print(f"  {workload:<8}" + "  ".join(f"{phase} {ms:.1f}" for phase, ms in phases.items()))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"\nSaved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            print(f"\n⚠️  {args.compare} was recorded with different settings; deltas may not be meaningful")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressed by more than {args.tolerance:.0%} against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n✅ Within {args.tolerance:.0%} of {args.compare}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Replay youtubeapilogs through the search-stage cache keys and report hit rates
+"before"    keys on normalize_query (case and whitespace), kept for SEARCH_CACHE_TTL
+"canonical" keys on canonical_query, kept for SEARCH_CACHE_TTL: the effect of the key alone
+"after"     keys on canonical_query, kept for QUERY_INDEX_TTL: adds the query index's longer life
+
+Usage:
+    python benchmarks/replay_query_logs.py                     # read youtubeapilogs from MONGODB_URI
+    python benchmarks/replay_query_logs.py --days 7 --limit 100000
+    python benchmarks/replay_query_logs.py --file logs.ndjson  # mongoexport output, one document per line
+"""
+
+import argparse
+import collections
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+def load_from_mongo(days: float, limit: int) -> list:
+    from pymongo import MongoClient
+    client = MongoClient(main.MONGODB_URI)
+    try:
+        cursor = client.get_database().youtubeapilogs.find(
+            {"createdAt": {"$gte": datetime.now() - timedelta(days=days)}, "query": {"$exists": True}},
+            {"query": 1, "status": 1, "videoId": 1, "createdAt": 1, "_id": 0}
+        ).sort("createdAt", 1).limit(limit)
+        return list(cursor)
+    finally:
+        client.close()
+
+def load_from_file(path: str) -> list:
+    logs = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            created = doc.get("createdAt")
+            # mongoexport writes dates as {"$date": "..."}
+            if isinstance(created, dict):
+                created = created.get("$date")
+            doc["createdAt"] = datetime.fromisoformat(str(created).replace("Z", "+00:00")).replace(tzinfo=None)
+            logs.append(doc)
+    logs.sort(key=lambda doc: doc["createdAt"])
+    return logs
+
+def replay(logs: list, key_fn, ttl: int) -> dict:
+    """Simulate a search cache keyed by key_fn that only successful lookups fill"""
+    filled = {}  # key -> fill time
+    hits = lookups = 0
+    for doc in logs:
+        key = key_fn(doc["query"])
+        now = doc["createdAt"].timestamp()
+        filled_at = filled.get(key)
+        lookups += 1
+        if filled_at is not None and now - filled_at < ttl:
+            hits += 1
+        elif doc.get("status") == "success":
+            filled[key] = now
+    return {"lookups": lookups, "hits": hits, "keys": len(filled)}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="newline-delimited JSON export of youtubeapilogs")
+    parser.add_argument("--days", type=float, default=7, help="how far back to read from MongoDB")
+    parser.add_argument("--limit", type=int, default=500000)
+    parser.add_argument("--top", type=int, default=10, help="merged keys to list")
+    args = parser.parse_args()
+
+    logs = load_from_file(args.file) if args.file else load_from_mongo(args.days, args.limit)
+    # URLs and video ids skip the search stage entirely
+    logs = [doc for doc in logs if doc.get("query") and not main.extract_video_id(doc["query"].strip())[0]]
+    if not logs:
+        sys.exit("No search queries to replay")
+
+    runs = (
+        ("before", main.normalize_query, main.SEARCH_CACHE_TTL),
+        ("canonical", main.canonical_query, main.SEARCH_CACHE_TTL),
+        ("after", main.canonical_query, main.QUERY_INDEX_TTL),
+    )
+    print(f"Replayed {len(logs)} search lookups from {logs[0]['createdAt']} to {logs[-1]['createdAt']}")
+    print(f"{'':<10} {'TTL':>9} {'hits':>8} {'hit rate':>9} {'keys':>8}")
+    for label, key_fn, ttl in runs:
+        result = replay(logs, key_fn, ttl)
+        print(f"{label:<10} {ttl / 3600:>8g}h {result['hits']:>8} {result['hits'] / result['lookups']:>9.1%} {result['keys']:>8}")
+
+    # Canonical keys that merged several spellings, and whether they resolved to one video
+    variants = collections.defaultdict(set)
+    videos = collections.defaultdict(set)
+    for doc in logs:
+        key = main.canonical_query(doc["query"])
+        variants[key].add(main.normalize_query(doc["query"]))
+        if doc.get("status") == "success" and doc.get("videoId"):
+            videos[key].add(doc["videoId"])
+    conflicts = [key for key, ids in videos.items() if len(ids) > 1]
+    print(f"\nCanonical keys resolving to more than one video (possible false merges): {len(conflicts)}")
+    for key in conflicts[:args.top]:
+        print(f"  {key!r}: {sorted(videos[key])}")
+    merged = sorted(variants.items(), key=lambda item: len(item[1]), reverse=True)[:args.top]
+    print("\nMost merged keys:")
+    for key, spellings in merged:
+        if len(spellings) < 2:
+            break
+        print(f"  {key!r} <- {sorted(spellings)[:5]}{' ...' if len(spellings) > 5 else ''}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -2,6 +2,16 @@
 Gunicorn configuration for production deployment
 """
 
+import os
+import shutil
+import tempfile
+
+# Prometheus multiprocess mode: workers write metric samples here and /metrics merges them.
+# Must be set before main (and prometheus_client) is imported, and start out empty
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "radhaapi-metrics"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
 # Server socket
 bind = "0.0.0.0:8000"
 backlog = 2048
@@ -31,3 +41,25 @@ graceful_timeout = 30
 
 # Preload app for better performance
 preload_app = True
+
+# Server hooks
+def when_ready(server):
+    """Warm the shared yt-dlp cache in the master, before any worker is forked"""
+    try:
+        from main import warm_ydl_cache
+    except ImportError:
+        return
+    warm_ydl_cache()
+
+def worker_exit(server, worker):
+    """Flush buffered API key usage counts before the worker goes away"""
+    try:
+        from main import usage_counter, MONGODB_URI
+    except ImportError:
+        return
+    usage_counter.flush_sync(MONGODB_URI)
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges (queue depth, in-flight) from /metrics"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
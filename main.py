@@ -3,21 +3,45 @@ FastAPI backend for YouTube audio streaming
 Single endpoint: /get-audio?query=
 """
 
-from fastapi import FastAPI, HTTPException, Query, Depends, Request
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.exception_handlers import http_exception_handler, request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.background import BackgroundTask
+from starlette.exceptions import HTTPException as StarletteHTTPException
 import yt_dlp
 import logging
 import uvicorn
-from typing import Optional
+from typing import List, Optional
+from pydantic import BaseModel, Field
 import asyncio
+import base64
+import contextlib
+import contextvars
 import functools
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import re
 import os
+import tempfile
+import time
+import unicodedata
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+import anyio
+import httpx
 import motor.motor_asyncio
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
 
 # Load environment variables
 load_dotenv()
@@ -33,6 +57,176 @@ else:
     logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Result cache settings
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2000"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+RESULT_CACHE_SAFETY_MARGIN = int(os.getenv("RESULT_CACHE_SAFETY_MARGIN", "600"))  # seconds before expire=
+RESULT_CACHE_DEFAULT_TTL = int(os.getenv("RESULT_CACHE_DEFAULT_TTL", "1800"))  # when the URL has no expire=
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "10000"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "21600"))  # query -> video id mappings
+RESULT_CACHE_REFRESH_WINDOW = int(os.getenv("RESULT_CACHE_REFRESH_WINDOW", "1800"))  # seconds before expiry a hit refreshes, 0 disables
+RESULT_REFRESH_INTERVAL = int(os.getenv("RESULT_REFRESH_INTERVAL", "60"))  # seconds between proactive refresh passes, 0 disables
+RESULT_REFRESH_MIN_HITS = int(os.getenv("RESULT_REFRESH_MIN_HITS", "3"))  # hits since the last pass that make an entry hot
+RESULT_REFRESH_MAX_PER_PASS = int(os.getenv("RESULT_REFRESH_MAX_PER_PASS", "20"))
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "true").lower() == "true"
+SHARED_CACHE_COLLECTION = os.getenv("SHARED_CACHE_COLLECTION", "audiocache")
+QUERY_INDEX_ENABLED = os.getenv("QUERY_INDEX_ENABLED", "true").lower() == "true"
+QUERY_INDEX_COLLECTION = os.getenv("QUERY_INDEX_COLLECTION", "queryindex")
+QUERY_INDEX_TTL = int(os.getenv("QUERY_INDEX_TTL", str(30 * 24 * 3600)))  # seconds a canonical query -> video id mapping lives
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "5000"))
+NEGATIVE_CACHE_NO_RESULTS_TTL = int(os.getenv("NEGATIVE_CACHE_NO_RESULTS_TTL", "600"))  # seconds, 0 disables
+NEGATIVE_CACHE_UNAVAILABLE_TTL = int(os.getenv("NEGATIVE_CACHE_UNAVAILABLE_TTL", "3600"))  # removed, private, region-locked
+NEGATIVE_CACHE_TRANSIENT_TTL = int(os.getenv("NEGATIVE_CACHE_TRANSIENT_TTL", "30"))  # other upstream failures
+
+# API key cache settings
+API_KEY_CACHE_TTL = int(os.getenv("API_KEY_CACHE_TTL", "30"))  # seconds, 0 disables the cache
+API_KEY_CACHE_WATCH = os.getenv("API_KEY_CACHE_WATCH", "true").lower() == "true"
+
+# Usage counter settings
+USAGE_FLUSH_INTERVAL_MS = int(os.getenv("USAGE_FLUSH_INTERVAL_MS", "1000"))
+USAGE_FLUSH_MAX_PENDING = int(os.getenv("USAGE_FLUSH_MAX_PENDING", "100"))
+
+# API log writer settings
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+LOG_LINGER_MS = int(os.getenv("LOG_LINGER_MS", "500"))
+LOG_QUEUE_MAX_SIZE = int(os.getenv("LOG_QUEUE_MAX_SIZE", "10000"))  # further logs are dropped and counted
+
+# Extraction executor settings
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "thread")  # "thread" or "process"
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "8"))
+EXTRACTION_MAX_QUEUE = int(os.getenv("EXTRACTION_MAX_QUEUE", "32"))  # waiting extractions before 503
+EXTRACTION_RETRY_AFTER = int(os.getenv("EXTRACTION_RETRY_AFTER", "5"))  # seconds
+
+# YoutubeDL instance pool settings
+YDL_POOL_MAX_USES = int(os.getenv("YDL_POOL_MAX_USES", "500"))  # extractions before an instance is recycled
+YDL_POOL_MAX_AGE = int(os.getenv("YDL_POOL_MAX_AGE", "3600"))  # seconds before an instance is recycled
+
+# yt-dlp cache settings (player JS plus signature and n-parameter solutions, shared by all workers)
+YDL_CACHE_DIR = os.getenv("YDL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "radhaapi-ydl-cache"))  # "" disables
+YDL_CACHE_WARM_URL = os.getenv("YDL_CACHE_WARM_URL", "https://www.youtube.com/watch?v=jNQXAC9IVRw")  # "" skips warm-up
+YDL_CACHE_WARM_TIMEOUT = int(os.getenv("YDL_CACHE_WARM_TIMEOUT", "15"))  # seconds per request during warm-up
+
+# Extraction profile settings
+EXTRACTION_PROFILE = os.getenv("EXTRACTION_PROFILE", "full")  # "full" or "fast" (experimental)
+EXTRACTION_FAST_CLIENTS = [c.strip() for c in os.getenv("EXTRACTION_FAST_CLIENTS", "visionos").split(",") if c.strip()]
+
+# WebSocket settings
+WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", "16"))  # concurrent lookups per connection
+WS_REAUTH_INTERVAL = int(os.getenv("WS_REAUTH_INTERVAL", "30"))  # seconds between API key re-checks
+
+# Audio relay settings
+RELAY_CHUNK_SIZE = int(os.getenv("RELAY_CHUNK_SIZE", str(64 * 1024)))  # bytes buffered per chunk
+RELAY_MAX_CONNECTIONS = int(os.getenv("RELAY_MAX_CONNECTIONS", "100"))
+RELAY_MAX_KEEPALIVE = int(os.getenv("RELAY_MAX_KEEPALIVE", "20"))
+RELAY_TIMEOUT = float(os.getenv("RELAY_TIMEOUT", "30"))  # seconds
+
+# Hot-track disk store settings (opt-in)
+HOT_TRACKS_ENABLED = os.getenv("HOT_TRACKS_ENABLED", "false").lower() == "true"
+HOT_TRACKS_DIR = os.getenv("HOT_TRACKS_DIR", os.path.join(tempfile.gettempdir(), "radhaapi-hot-tracks"))
+HOT_TRACKS_MAX_BYTES = int(os.getenv("HOT_TRACKS_MAX_BYTES", str(1024 * 1024 * 1024)))
+HOT_TRACKS_MAX_FILE_BYTES = int(os.getenv("HOT_TRACKS_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+HOT_TRACKS_THRESHOLD = int(os.getenv("HOT_TRACKS_THRESHOLD", "50"))  # requests within the window
+HOT_TRACKS_WINDOW = int(os.getenv("HOT_TRACKS_WINDOW", "3600"))  # seconds of youtubeapilogs to count
+HOT_TRACKS_SCAN_INTERVAL = int(os.getenv("HOT_TRACKS_SCAN_INTERVAL", "300"))  # seconds
+HOT_TRACKS_PER_SCAN = int(os.getenv("HOT_TRACKS_PER_SCAN", "20"))  # downloads per scan at most
+
+# Job API settings
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "25"))  # long-poll cap, below the 30 s router timeout
+JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "2"))  # seconds
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "300"))  # seconds finished jobs stay pollable
+JOBS_SHARED = os.getenv("JOBS_SHARED", "true").lower() == "true"  # record job state in MongoDB for every worker
+JOBS_COLLECTION = os.getenv("JOBS_COLLECTION", "jobs")
+JOB_LEASE = int(os.getenv("JOB_LEASE", "120"))  # seconds a pending job stays claimed by the worker running it
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))  # seconds between MongoDB checks while long-polling
+
+# Batch endpoint settings
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "50"))
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Prometheus metrics. Under gunicorn, PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py) makes
+# every worker write its samples there, and /metrics merges them
+PHASE_SECONDS = Histogram(
+    "radhaapi_phase_seconds",
+    "Time spent in each phase of a lookup",
+    ["phase"],  # auth, coalesced, queue, extract_info, format, log_write
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+CACHE_LOOKUPS = Counter("radhaapi_cache_lookups_total", "Cache lookups by cache and outcome", ["cache", "result"])
+LOOKUP_ERRORS = Counter("radhaapi_errors_total", "Failed requests by error class", ["error_class"])
+EXECUTOR_QUEUED = Gauge(
+    "radhaapi_executor_queued", "Extractions waiting for a pool slot", multiprocess_mode="livesum"
+)
+EXECUTOR_ACTIVE = Gauge(
+    "radhaapi_executor_in_flight", "Extractions running on the pool", multiprocess_mode="livesum"
+)
+
+# Per-request phase durations in seconds for Server-Timing, when the endpoint asked for them
+request_timings = contextvars.ContextVar("request_timings", default=None)
+SERVER_TIMING_PHASES = ("auth", "cache", "coalesced", "queue", "search", "resolve", "log", "total")
+
+def record_timing(phase: str, seconds: float):
+    """Add to the current request's phase breakdown, if it is collecting one"""
+    timings = request_timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+@contextlib.contextmanager
+def phase_timer(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(phase, time.perf_counter() - start)
+
+def timed_phase(phase: str):
+    """Decorator recording a function's duration in PHASE_SECONDS and the request's timings"""
+    histogram = PHASE_SECONDS.labels(phase)
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    histogram.observe(elapsed)
+                    record_timing(phase, elapsed)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    histogram.observe(elapsed)
+                    record_timing(phase, elapsed)
+        return wrapper
+    return decorator
+
+async def start_request_timing() -> dict:
+    """Dependency that makes the rest of the request collect a phase breakdown
+
+    Must be async, and listed before the auth dependency, so the context variable is
+    set in the request's own task before any phase runs.
+    """
+    timings = {"_start": time.perf_counter()}
+    request_timings.set(timings)
+    return timings
+
+def timing_breakdown(timings: dict) -> dict:
+    """Phase durations in milliseconds, in Server-Timing order"""
+    return {
+        phase: round(timings[phase] * 1000, 1)
+        for phase in SERVER_TIMING_PHASES if phase in timings
+    }
+
+def server_timing_header(breakdown: dict) -> str:
+    return ", ".join(f"{phase};dur={ms}" for phase, ms in breakdown.items())
+
 app = FastAPI(
     title="RadhaAPI YouTube Audio Streaming",
     description="FastAPI backend for fetching YouTube audio streams for Telegram bots and web applications",
@@ -83,6 +277,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def with_server_timing(response: Response) -> Response:
+    """Add Server-Timing to an error response for a request that was collecting timings"""
+    timings = request_timings.get()
+    if timings is not None:
+        timings["total"] = time.perf_counter() - timings["_start"]
+        response.headers["Server-Timing"] = server_timing_header(timing_breakdown(timings))
+    return response
+
+# Errors raised before the endpoint runs (a rejected API key, a missing query) still get
+# the Server-Timing header, as long as start_request_timing ran first
+@app.exception_handler(StarletteHTTPException)
+async def timed_http_exception_handler(request: Request, exc: StarletteHTTPException):
+    return with_server_timing(await http_exception_handler(request, exc))
+
+@app.exception_handler(RequestValidationError)
+async def timed_validation_exception_handler(request: Request, exc: RequestValidationError):
+    return with_server_timing(await request_validation_exception_handler(request, exc))
+
 # MongoDB connection
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/radhaapi")
 client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI)
@@ -95,6 +307,18 @@ async def startup_db_client():
     try:
         # Test the connection
         await client.admin.command('ping')
+        if extractor.shared_cache:
+            await extractor.shared_cache.ensure_indexes()
+        if extractor.query_index:
+            await extractor.query_index.ensure_indexes()
+        await job_manager.ensure_indexes()
+        if API_KEY_CACHE_WATCH and api_key_cache.ttl > 0:
+            api_key_cache.start_watch(db.users)
+        usage_counter.start()
+        api_log_writer.start()
+        if hot_tracks:
+            await hot_tracks.ensure_indexes()
+            hot_tracks.start()
         logger.info(f"Connected to MongoDB: {MONGODB_URI}")
         logger.info(f"Environment: {ENVIRONMENT}")
         logger.info(f"FastAPI backend started successfully on https://www.radhaapi.me")
@@ -105,23 +329,383 @@ async def startup_db_client():
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close database connection on shutdown"""
+    await api_key_cache.stop_watch()
+    await usage_counter.stop()
+    await api_log_writer.stop()
+    if hot_tracks:
+        await hot_tracks.stop()
+    if extractor.shared_cache:
+        await extractor.shared_cache.flush()
+    if extractor.query_index:
+        await extractor.query_index.flush()
+    await job_manager.flush()
     client.close()
     logger.info("Disconnected from MongoDB")
 
+@app.on_event("startup")
+async def startup_extractor():
+    """Start the extraction pool and the proactive cache refresh"""
+    await extractor.executor.start()
+    extractor.start_refresh()
+    if extractor.profile == "fast":
+        logger.warning("EXTRACTION_PROFILE=fast is experimental; compare it with "
+                       "benchmarks/bench_extraction_profiles.py before relying on it")
+
+@app.on_event("shutdown")
+async def shutdown_extractor():
+    """Stop the extraction pool"""
+    await extractor.stop_refresh()
+    extractor.executor.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_relay_client():
+    """Close pooled upstream connections used by /stream"""
+    global relay_client
+    if relay_client is not None:
+        await relay_client.aclose()
+        relay_client = None
+
+class ApiLogWriter:
+    """Bounded background pipeline that writes youtubeapilogs in batches"""
+
+    # Queued by stop() so the loop finishes its batch and exits without being cancelled
+    _STOP = object()
+
+    def __init__(self, collection, batch_size: int, linger_ms: int, max_queue_size: int):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self._queue = asyncio.Queue(maxsize=max_queue_size)
+        self._task = None
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def write(self, doc: dict):
+        """Queue a log document without waiting for MongoDB"""
+        try:
+            self._queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            # Overflow policy: drop the newest log and count it
+            self.dropped += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer and drain what is left in the queue"""
+        if self._task is not None:
+            # Cancelling could land inside insert_many and lose the batch, so let the loop
+            # reach the sentinel and return on its own
+            await self._queue.put(self._STOP)
+            await self._task
+            self._task = None
+        while not self._queue.empty():
+            batch = []
+            while not self._queue.empty() and len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+            await self._insert(batch)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            doc = await self._queue.get()
+            if doc is self._STOP:
+                return
+            batch = [doc]
+            # Linger briefly so bursts go out as one insert_many
+            deadline = loop.time() + self.linger
+            stopping = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    doc = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if doc is self._STOP:
+                    stopping = True
+                    break
+                batch.append(doc)
+            await self._insert(batch)
+            if stopping:
+                return
+
+    @timed_phase("log_write")
+    async def _insert(self, batch: list):
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except Exception as e:
+            self.errors += 1
+            self.dropped += len(batch)
+            logger.warning(f"Could not write {len(batch)} API logs: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+api_log_writer = ApiLogWriter(
+    db.youtubeapilogs,
+    batch_size=LOG_BATCH_SIZE,
+    linger_ms=LOG_LINGER_MS,
+    max_queue_size=LOG_QUEUE_MAX_SIZE
+)
+
 # Security
 security = HTTPBearer(auto_error=False)
 
+class ApiKeyCache:
+    """Short-lived per-worker cache of API key -> user record"""
+
+    # Only the fields a request needs
+    PROJECTION = {"_id": 1, "username": 1, "apiKeyExpiresAt": 1, "apiKeyStatus": 1}
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries = {}  # api_key -> (expires_at, user)
+        self._keys_by_user = {}  # user _id -> api_key
+        self._watch_task = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, api_key: str) -> Optional[dict]:
+        entry = self._entries.get(api_key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if time.monotonic() >= expires_at:
+            self._drop(api_key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return user
+
+    def set(self, api_key: str, user: dict):
+        if self.ttl <= 0:
+            return
+        self._entries[api_key] = (time.monotonic() + self.ttl, user)
+        self._keys_by_user[user["_id"]] = api_key
+
+    def invalidate_user(self, user_id):
+        api_key = self._keys_by_user.get(user_id)
+        if api_key is not None:
+            self._drop(api_key)
+            self.invalidations += 1
+
+    def _drop(self, api_key: str):
+        entry = self._entries.pop(api_key, None)
+        if entry is not None:
+            user_id = entry[1]["_id"]
+            if self._keys_by_user.get(user_id) == api_key:
+                del self._keys_by_user[user_id]
+
+    def start_watch(self, collection):
+        """Invalidate entries as soon as a user document changes"""
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(collection))
+
+    async def stop_watch(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self, collection):
+        # Only changes to the fields we cache; the usage counter's $inc would otherwise
+        # clear every active user's entry in every worker on each flush
+        cached_fields = [field for field in self.PROJECTION if field != "_id"] + ["apiKey"]
+        pipeline = [{"$match": {"$or": [
+            {"operationType": {"$in": ["replace", "delete"]}},
+            {"operationType": "update", "$or": [
+                *({f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in cached_fields),
+                {"updateDescription.removedFields": {"$in": cached_fields}},
+            ]},
+        ]}}]
+        retry_delay = 1
+        while True:
+            try:
+                async with collection.watch(pipeline) as stream:
+                    retry_delay = 1
+                    async for change in stream:
+                        self.invalidate_user(change["documentKey"]["_id"])
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                # Standalone servers have no change streams; rely on the TTL alone
+                logger.warning(f"API key cache change stream unavailable, using TTL only: {e}")
+                return
+            except Exception as e:
+                logger.warning(f"API key cache change stream interrupted: {e}")
+            # Anything we missed while disconnected may be stale
+            self._entries.clear()
+            self._keys_by_user.clear()
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+api_key_cache = ApiKeyCache(ttl=API_KEY_CACHE_TTL)
+
+class UsageCounter:
+    """Write-behind aggregator for apiKeyUsageCount increments"""
+
+    def __init__(self, collection, interval_ms: int, max_pending: int):
+        self.collection = collection
+        self.interval = interval_ms / 1000
+        self.max_pending = max_pending
+        self._pending = {}  # user _id -> count
+        self._pending_total = 0
+        self._wakeup = None
+        self._task = None
+        self._stopping = False
+        self.flushes = 0
+        self.errors = 0
+
+    def increment(self, user_id, count: int = 1):
+        self._pending[user_id] = self._pending.get(user_id, 0) + count
+        self._pending_total += count
+        if self._pending_total >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still pending"""
+        if self._task is not None:
+            # Not cancelled: a cancel inside bulk_write would lose the counts it had taken
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _take_pending(self) -> dict:
+        pending = self._pending
+        self._pending = {}
+        self._pending_total = 0
+        return pending
+
+    def _restore_pending(self, pending: dict):
+        for user_id, count in pending.items():
+            self.increment(user_id, count)
+
+    @staticmethod
+    def _operations(pending: dict) -> list:
+        return [
+            UpdateOne({"_id": user_id}, {"$inc": {"apiKeyUsageCount": count}})
+            for user_id, count in pending.items()
+        ]
+
+    async def flush(self):
+        """Write pending increments as a single unordered bulk write"""
+        if not self._pending:
+            return
+        pending = self._take_pending()
+        try:
+            await self.collection.bulk_write(self._operations(pending), ordered=False)
+            self.flushes += 1
+        except asyncio.CancelledError:
+            # Put the counts back so the shutdown flush can still write them
+            self._restore_pending(pending)
+            raise
+        except Exception as e:
+            # Keep the counts and try again on the next flush
+            self.errors += 1
+            self._restore_pending(pending)
+            logger.warning(f"Could not flush API key usage counts: {e}")
+
+    def flush_sync(self, mongodb_uri: str):
+        """Blocking flush for when the event loop is already gone (gunicorn worker exit)"""
+        if not self._pending:
+            return
+        pending = self._take_pending()
+        sync_client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=5000)
+        try:
+            sync_client.get_database()[self.collection.name].bulk_write(
+                self._operations(pending), ordered=False
+            )
+            self.flushes += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Lost {sum(pending.values())} API key usage counts on exit: {e}")
+        finally:
+            sync_client.close()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending_total,
+            "flushes": self.flushes,
+            "errors": self.errors,
+        }
+
+usage_counter = UsageCounter(
+    db.users,
+    interval_ms=USAGE_FLUSH_INTERVAL_MS,
+    max_pending=USAGE_FLUSH_MAX_PENDING
+)
+
 # API Key validation
 async def validate_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Validate API key from Authorization header"""
+    user = await check_api_key(credentials)
+    
+    # Increment usage count (written in batches by the usage counter)
+    usage_counter.increment(user["_id"])
+    
+    return user
+
+async def check_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Validate API key from Authorization header without counting a use (e.g. job polling)"""
     if not credentials:
         raise HTTPException(
             status_code=403,
             detail="Authorization header required. Use: Authorization: Bearer <API_KEY>"
         )
     
-    api_key = credentials.credentials
-    
+    return await authenticate_api_key(credentials.credentials)
+
+@timed_phase("auth")
+async def authenticate_api_key(api_key: str) -> dict:
+    """Look up and check an API key, without counting a use"""
+    try:
+        return await _authenticate_api_key(api_key)
+    except HTTPException:
+        LOOKUP_ERRORS.labels("auth").inc()
+        raise
+
+async def _authenticate_api_key(api_key: str) -> dict:
     if not api_key:
         raise HTTPException(
             status_code=403,
@@ -129,13 +713,18 @@ async def validate_api_key(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     
     # Find user with this API key
-    user = await db.users.find_one({"apiKey": api_key})
-    
-    if not user:
-        raise HTTPException(
-            status_code=403,
-            detail="Invalid API key"
-        )
+    user = api_key_cache.get(api_key)
+    if user is None:
+        user = await db.users.find_one({"apiKey": api_key}, ApiKeyCache.PROJECTION)
+        
+        if not user:
+            raise HTTPException(
+                status_code=403,
+                detail="Invalid API key"
+            )
+        
+        user["apiKey"] = api_key
+        api_key_cache.set(api_key, user)
     
     # Check if API key is expired
     if user.get("apiKeyExpiresAt") and datetime.now() > user["apiKeyExpiresAt"]:
@@ -147,7 +736,7 @@ async def validate_api_key(credentials: HTTPAuthorizationCredentials = Depends(s
     # Check if API key is blocked
     if user.get("apiKeyStatus") == "blocked":
         # Log the blocked attempt
-        await db.youtubeapilogs.insert_one({
+        api_log_writer.write({
             "user": user["_id"],
             "apiKey": api_key,
             "query": "blocked_attempt",
@@ -162,16 +751,719 @@ async def validate_api_key(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="API Key is blocked by admin."
         )
     
-    # Increment usage count
-    await db.users.update_one(
-        {"_id": user["_id"]},
-        {"$inc": {"apiKeyUsageCount": 1}}
+    return user
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query into a cache key"""
+    return " ".join(query.lower().split())
+
+# Phrases that don't change which track a query is after, longest first
+QUERY_FILLER_PATTERN = re.compile(
+    r"\b(?:official music video|official lyric(?:al)? video|official video|official audio|lyric(?:al)? video"
+    r"|music video|video song|audio song|full song|full video|full audio|with lyrics"
+    r"|lyrics|lyric|lyrical)\b"
+)
+# Single words that are part of many titles ("Video Games"), so only dropped from the end
+QUERY_TRAILING_FILLER_PATTERN = re.compile(r"(?: (?:official|audio|video|hd|hq|4k|1080p|720p|mp3))+$")
+# Spelling variants are only folded onto these romanized Hindi/Urdu words, written as folded:
+# pyaar/pyar, teree/teri, mohabbat/mohabat, ishq/ishk, zindagi/jindagi, wada/vada. Folding every
+# word would merge English titles (Sleep/Slip, Pool/Pull, Wine/Vine), so words that an English
+# word folds onto (rat, bat, tu, pal, dil) are left out
+LATIN_FOLDS = (("ee", "i"), ("oo", "u"), ("ph", "f"), ("q", "k"), ("w", "v"), ("z", "j"))
+DOUBLED_LETTER_PATTERN = re.compile(r"([a-z])\1+")
+HINGLISH_WORDS = frozenset("""
+    pyar pyara pyari ishk mohabat muhabat jindagi vada kasam dilbar dildar divana divani
+    teri tera tere meri mera mere tumhari tumhara hamari hamara kabhi nahi kahin kuch jara
+    sath yad yar yara sanam sajan sajna mahi chand ankhon sanson duniya kismat khvab khvahish
+    jina marna bahon juda jaye jana hai hain hu ho hi
+""".split())
+QUERY_DROPPED_CHARS = str.maketrans("", "", "'\u2019`\ufe0e\ufe0f")
+
+def _fold_token(token: str) -> str:
+    """Spelling-insensitive form of a romanized Hindi/Urdu word; anything else passes through"""
+    if not (token.isascii() and token.isalpha()):
+        return token
+    folded = token
+    for variant, canonical in LATIN_FOLDS:
+        folded = folded.replace(variant, canonical)
+    folded = DOUBLED_LETTER_PATTERN.sub(r"\1", folded)
+    return folded if folded in HINGLISH_WORDS else token
+
+def canonical_query(query: str) -> str:
+    """Cache key shared by queries for the same track
+    
+    Ignores case, whitespace, punctuation, emoji, filler such as "lyrics" or "official
+    video" (and "audio", "hd" and the like at the end), and common Hinglish spelling variants.
+    """
+    text = unicodedata.normalize("NFKC", query).lower().translate(QUERY_DROPPED_CHARS)
+    # Punctuation, symbols (emoji included) and invisible format characters separate words
+    text = "".join(
+        " " if unicodedata.category(ch)[0] in "PSZ" or unicodedata.category(ch) in ("Cc", "Cf") else ch
+        for ch in text
+    )
+    words = QUERY_FILLER_PATTERN.sub(" ", text).split() or text.split()
+    words = QUERY_TRAILING_FILLER_PATTERN.sub("", " ".join(words)).split()
+    # Queries made only of emoji or symbols keep their own key rather than all sharing ""
+    return " ".join(_fold_token(word) for word in words) or normalize_query(query)
+
+# youtu.be links, watch?v= / shorts / embed / live URLs on any youtube.com host
+YOUTUBE_URL_PATTERN = re.compile(
+    r"^(?:https?://)?(?:[\w-]+\.)?(?:youtu\.be/|(?:youtube|youtube-nocookie)\.com/"
+    r"(?:watch\?(?:[^#]*&)?v=|shorts/|embed/|live/|v/))([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])"
+)
+VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{11}$")
+# Words run together with an optional number at the end: "ShapeOfYou1", "believer123", "Hello-World"
+RUN_TOGETHER_WORDS_PATTERN = re.compile(r"^(?:[A-Z]?[a-z]+[-_]?)+[0-9]*$")
+
+def _looks_like_video_id(candidate: str) -> bool:
+    """Random-looking: mixed case plus a digit, "-" or "_", and not words run together"""
+    return (
+        any(ch.isdigit() or ch in "-_" for ch in candidate)
+        and any(ch.islower() for ch in candidate)
+        and any(ch.isupper() for ch in candidate)
+        and not RUN_TOGETHER_WORDS_PATTERN.match(candidate)
     )
+
+def extract_video_id(query: str) -> tuple:
+    """Detect a YouTube URL or bare video id, returning (video_id, is_url)
     
-    return user
+    Bare 11-character strings only count when they look like an id; see possible_video_id.
+    """
+    query = query.strip()
+    match = YOUTUBE_URL_PATTERN.match(query)
+    if match:
+        return match.group(1), True
+    if VIDEO_ID_PATTERN.match(query) and _looks_like_video_id(query):
+        return query, False
+    return None, False
+
+def possible_video_id(query: str) -> Optional[str]:
+    """An 11-character single word that may be an id or a search ("ArijitSingh", "believer123")"""
+    query = query.strip()
+    if not VIDEO_ID_PATTERN.match(query) or _looks_like_video_id(query):
+        return None
+    # Plain words ("programming", "Programming") are searches, not ids
+    if query.isalpha() and (query.islower() or query.isupper() or query.istitle()):
+        return None
+    return query
+
+def get_url_expiry(url: str) -> Optional[int]:
+    """Read the expire= timestamp from a signed googlevideo URL"""
+    if not url:
+        return None
+    try:
+        parsed = urlparse(url)
+        expire = parse_qs(parsed.query).get("expire")
+        if expire:
+            return int(expire[0])
+        # Manifest style URLs carry it in the path: /expire/1700000000/
+        match = re.search(r"/expire/(\d+)", parsed.path)
+        if match:
+            return int(match.group(1))
+    except ValueError:
+        pass
+    return None
+
+class ResultCache:
+    """In-process LRU cache of formatted results, expiring with the stream URL"""
+
+    def __init__(self, max_entries: int, max_bytes: int, safety_margin: int, default_ttl: int, name: str = "result"):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.safety_margin = safety_margin
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, result)
+        self._heat = {}  # key -> hits since the last hot_expiring() pass
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(key: str, result: dict) -> int:
+        # Rough payload size; the formatted result is a handful of short strings
+        return len(key) + sum(len(str(v)) for v in result.values()) + 64
+
+    def expires_at(self, result: dict) -> float:
+        """Work out when a result must leave the cache"""
+        url_expiry = get_url_expiry(result.get("audio_url"))
+        if url_expiry:
+            return url_expiry - self.safety_margin
+        return time.time() + self.default_ttl
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        """Return (result, expires_at) for a live entry"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            CACHE_LOOKUPS.labels(self.name, "miss").inc()
+            return None
+        expires_at, size, result = entry
+        if time.time() >= expires_at:
+            self._remove(key)
+            self.misses += 1
+            CACHE_LOOKUPS.labels(self.name, "miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        CACHE_LOOKUPS.labels(self.name, "hit").inc()
+        self._heat[key] = self._heat.get(key, 0) + 1
+        return dict(result), expires_at
+
+    def peek(self, key: str) -> Optional[dict]:
+        """Return a live entry without touching recency or hit counts"""
+        entry = self._entries.get(key)
+        if entry is None or time.time() >= entry[0]:
+            return None
+        return dict(entry[2])
+
+    def pop(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    def hot_expiring(self, within: float, min_hits: int, limit: int) -> list:
+        """Keys hit at least min_hits times since the last pass that expire within `within` seconds
+
+        Hottest first. Hit counts start over after every pass.
+        """
+        deadline = time.time() + within
+        hot = [
+            (hits, key) for key, hits in self._heat.items()
+            if hits >= min_hits and key in self._entries and self._entries[key][0] <= deadline
+        ]
+        self._heat.clear()
+        hot.sort(reverse=True)
+        return [key for _, key in hot[:limit]]
+
+    def set(self, key: str, result: dict, expires_at: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        if expires_at is None:
+            expires_at = self.expires_at(result)
+        if expires_at <= time.time():
+            return
+        size = self._entry_size(key, result)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, size, dict(result))
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._heat.pop(key, None)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+class SharedResultCache:
+    """MongoDB-backed result cache shared by every worker and dyno"""
+
+    def __init__(self, collection, name: str = "Shared cache"):
+        self.collection = collection
+        self.name = name
+        self.metric_label = name.lower().replace(" ", "_")
+        self._pending_writes = set()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def ensure_indexes(self):
+        """Let MongoDB drop documents once their stream URL has expired"""
+        try:
+            await self.collection.create_index("expiresAt", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Could not create {self.name.lower()} TTL index: {e}")
+
+    async def get(self, key: str) -> Optional[tuple]:
+        """Return (result, expires_at) for a live entry, or None"""
+        try:
+            # The TTL monitor only runs once a minute, so filter on expiry as well
+            with phase_timer("cache"):
+                doc = await self.collection.find_one({
+                    "_id": key,
+                    "expiresAt": {"$gt": datetime.utcnow()}
+                })
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"{self.name} lookup failed: {e}")
+            return None
+        if not doc:
+            self.misses += 1
+            CACHE_LOOKUPS.labels(self.metric_label, "miss").inc()
+            return None
+        self.hits += 1
+        CACHE_LOOKUPS.labels(self.metric_label, "hit").inc()
+        expires_at = doc["expiresAt"].replace(tzinfo=timezone.utc).timestamp()
+        return doc["result"], expires_at
+
+    def set(self, key: str, result: dict, expires_at: float):
+        """Upsert an entry in the background so the response is not held up"""
+        self._background(self._upsert(key, result, expires_at))
+
+    def delete(self, key: str):
+        """Remove an entry in the background"""
+        self._background(self._delete(key))
+
+    def _background(self, coro):
+        task = asyncio.create_task(coro)
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def _delete(self, key: str):
+        try:
+            await self.collection.delete_one({"_id": key})
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"{self.name} delete failed: {e}")
+
+    async def _upsert(self, key: str, result: dict, expires_at: float):
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "result": result,
+                    "expiresAt": datetime.utcfromtimestamp(expires_at),
+                    "updatedAt": datetime.now()
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"{self.name} write failed: {e}")
+
+    async def flush(self):
+        """Wait for background writes to finish"""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+class NegativeCache:
+    """In-process cache of failed lookups, so retries get the same error without another extraction"""
+
+    # yt-dlp messages for videos that will keep failing, as opposed to network or bot-check errors
+    UNAVAILABLE_PATTERN = re.compile(
+        r"video unavailable|is not available|private video|has been removed|account .* terminated"
+        r"|copyright|confirm your age|age-restricted|members-only|blocked it in your country"
+        r"|not made this video available",
+        re.IGNORECASE
+    )
+
+    def __init__(self, max_entries: int, ttls: dict):
+        self.max_entries = max_entries
+        self.ttls = ttls  # kind -> seconds
+        self._entries = OrderedDict()  # key -> (expires_at, kind, status_code, detail)
+        self.stored = {kind: 0 for kind in ttls}
+        self.hits = {kind: 0 for kind in ttls}
+
+    @classmethod
+    def error_class(cls, error: HTTPException) -> str:
+        """Metrics label for a failed lookup"""
+        if error.status_code == 503:
+            return "overloaded"
+        if error.status_code in (401, 403):
+            return "auth"
+        return cls.classify(error) or "bad_request"
+
+    @classmethod
+    def classify(cls, error: HTTPException) -> Optional[str]:
+        """Kind of failure, or None if it shouldn't be cached (e.g. 503 from a full queue)"""
+        if error.status_code == 404:
+            return "no_results"
+        if error.status_code != 500:
+            return None
+        if cls.UNAVAILABLE_PATTERN.search(str(error.detail)):
+            return "unavailable"
+        return "transient"
+
+    def get(self, key: str) -> Optional[HTTPException]:
+        entry = self._entries.get(key)
+        if entry is None:
+            CACHE_LOOKUPS.labels("negative", "miss").inc()
+            return None
+        expires_at, kind, status_code, detail = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            CACHE_LOOKUPS.labels("negative", "miss").inc()
+            return None
+        self.hits[kind] += 1
+        CACHE_LOOKUPS.labels("negative", "hit").inc()
+        return HTTPException(status_code=status_code, detail=detail)
+
+    def add(self, key: str, error: HTTPException):
+        kind = self.classify(error)
+        ttl = self.ttls.get(kind, 0) if kind else 0
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (time.time() + ttl, kind, error.status_code, error.detail)
+        self.stored[kind] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "stored": dict(self.stored),
+            "hits": dict(self.hits),
+        }
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight call"""
+
+    def __init__(self):
+        self._calls = {}  # key -> asyncio.Task
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn):
+        """Run fn() unless a call for key is already in flight, then share its outcome
+        
+        The caller that starts the call gets its phases in its timings; later callers get
+        the time they waited as "coalesced".
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            # Run as its own task so one waiter disconnecting does not cancel the others
+            timings = {} if request_timings.get() is not None else None
+            task = asyncio.ensure_future(self._run(fn, timings))
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._finished, key))
+            try:
+                return await asyncio.shield(task)
+            finally:
+                # The caller that started the call waited for all of it
+                for phase, seconds in (timings or {}).items():
+                    record_timing(phase, seconds)
+        self.coalesced += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.shield(task)
+        finally:
+            waited = time.perf_counter() - start
+            PHASE_SECONDS.labels("coalesced").observe(waited)
+            record_timing("coalesced", waited)
+    
+    @staticmethod
+    async def _run(fn, timings: Optional[dict]):
+        # The task copies its starter's context. Record into a dict of its own instead, since the
+        # task can outlive a starter that disconnects; do() hands the phases over once it is done
+        request_timings.set(timings)
+        return await fn()
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+class YdlCacheStats:
+    """Hit/miss counters for yt-dlp's on-disk cache, by cache section"""
 
-class YouTubeAudioExtractor:
     def __init__(self):
+        self._lock = threading.Lock()
+        self._sections = {}
+
+    def record(self, section: str, outcome: str):
+        with self._lock:
+            counts = self._sections.setdefault(section, {"hits": 0, "misses": 0, "stores": 0})
+            counts[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            sections = {name: dict(counts) for name, counts in self._sections.items()}
+        totals = {outcome: sum(c[outcome] for c in sections.values()) for outcome in ("hits", "misses", "stores")}
+        return {"dir": YDL_CACHE_DIR or None, **totals, "sections": sections}
+
+ydl_cache_stats = YdlCacheStats()
+
+class CountingCache(yt_dlp.cache.Cache):
+    """yt-dlp's on-disk cache, counting loads and stores into ydl_cache_stats
+
+    Stores go through yt-dlp's write_json_file, which writes a temp file and renames it
+    into place, so workers sharing the directory never read a partial entry.
+    """
+
+    def load(self, section, key, dtype='json', default=None, **kwargs):
+        data = super().load(section, key, dtype, default, **kwargs)
+        if self.enabled:
+            ydl_cache_stats.record(section, "misses" if data is default else "hits")
+        return data
+
+    def store(self, section, key, data, dtype='json'):
+        super().store(section, key, data, dtype)
+        if self.enabled:
+            ydl_cache_stats.record(section, "stores")
+
+class YoutubeDLPool:
+    """Long-lived yt_dlp.YoutubeDL instances, one per pool thread and option set"""
+
+    def __init__(self, max_uses: int, max_age: int):
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.recycled = 0
+
+    @staticmethod
+    def _options_key(opts: dict) -> str:
+        # Options arrive pickled in process mode, so key on content rather than identity
+        return json.dumps(opts, sort_keys=True, default=str)
+
+    def get(self, opts: dict) -> yt_dlp.YoutubeDL:
+        """Return this thread's instance for opts, creating or recycling it as needed"""
+        instances = getattr(self._local, "instances", None)
+        if instances is None:
+            instances = self._local.instances = {}
+        key = self._options_key(opts)
+        entry = instances.get(key)
+        if entry is not None:
+            ydl, created_at, uses = entry
+            if uses < self.max_uses and time.monotonic() - created_at < self.max_age:
+                instances[key] = (ydl, created_at, uses + 1)
+                with self._lock:
+                    self.reused += 1
+                return ydl
+            # Recycle so per-instance state (cookies, caches) can't grow without bound
+            ydl.close()
+            with self._lock:
+                self.recycled += 1
+        # YoutubeDL fills defaults into the dict it is given, so hand it a copy
+        ydl = yt_dlp.YoutubeDL(dict(opts))
+        ydl.cache = CountingCache(ydl)
+        instances[key] = (ydl, time.monotonic(), 1)
+        with self._lock:
+            self.created += 1
+        return ydl
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "recycled": self.recycled,
+            }
+
+class ExtractionError(Exception):
+    """Picklable extraction failure, raised across the process pool boundary"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def _extract_in_process(method: str, *args):
+    """Process pool entry point; only the compact result goes back over IPC"""
+    try:
+        return getattr(extractor, method)(*args)
+    except HTTPException as e:
+        raise ExtractionError(e.status_code, e.detail) from None
+    except Exception as e:
+        raise ExtractionError(500, f"Error extracting audio: {str(e)}") from None
+
+def _noop():
+    return os.getpid()
+
+class ExtractionExecutor:
+    """Dedicated, bounded pool for yt-dlp work, backed by threads or processes"""
+
+    def __init__(self, max_workers: int, max_queue: int, retry_after: int,
+                 backend: str = "thread", initializer=None):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown extraction backend: {backend}")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.backend = backend
+        self.initializer = initializer
+        self._pool = None
+        # Only max_workers jobs are handed to the pool; the rest wait here, where we can see them
+        self._slots = asyncio.Semaphore(max_workers)
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _create_pool(self):
+        if self.backend == "process":
+            # spawn keeps children free of the parent's event loop and Mongo client threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="extractor",
+                initializer=self.initializer
+            )
+
+    async def start(self):
+        """Create the pool, pre-forking every worker process up front"""
+        if self._pool is None:
+            self._create_pool()
+        if self.backend == "process":
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[
+                loop.run_in_executor(self._pool, _noop) for _ in range(self.max_workers)
+            ])
+
+    async def run(self, fn, *args, phase: Optional[str] = None):
+        """Run fn(*args) on the pool, failing fast with 503 when the queue is full
+        
+        Time spent waiting for a slot is recorded as the "queue" phase and, when given,
+        the run itself under phase.
+        """
+        if self._slots.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        if self._pool is None:
+            self._create_pool()
+        
+        submitted = time.monotonic()
+        self.queued += 1
+        EXECUTOR_QUEUED.set(self.queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+            EXECUTOR_QUEUED.set(self.queued)
+        
+        waited = time.monotonic() - submitted
+        self.wait_count += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        PHASE_SECONDS.labels("queue").observe(waited)
+        record_timing("queue", waited)
+        
+        self.active += 1
+        EXECUTOR_ACTIVE.set(self.active)
+        started = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, fn, *args)
+        finally:
+            if phase:
+                record_timing(phase, time.monotonic() - started)
+            self.active -= 1
+            EXECUTOR_ACTIVE.set(self.active)
+            self.completed += 1
+            self._slots.release()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "workers": self.max_workers,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_avg_ms": round(self.wait_total / self.wait_count * 1000, 1) if self.wait_count else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 1),
+        }
+
+# Format preference: audio-only first, then container, then audio bitrate
+AUDIO_ONLY_BONUS = 1000
+EXT_BONUS = {'m4a': 100, 'webm': 100, 'mp4': 50}
+
+class StreamSelection:
+    """Best audio format URL and thumbnail picked from a yt-dlp info dict"""
+
+    __slots__ = ("audio_url", "thumbnail")
+
+    def __init__(self, audio_url: Optional[str], thumbnail: Optional[str]):
+        self.audio_url = audio_url
+        self.thumbnail = thumbnail
+
+def select_stream(video_info: dict) -> StreamSelection:
+    """Single pass over formats and thumbnails, keeping only the best candidate of each
+
+    Ties go to the earliest entry, as with the stable sort this replaces, and the info
+    dict is left untouched.
+    """
+    audio_url = None
+    best_score = None
+    for f in video_info.get('formats') or ():
+        url = f.get('url')
+        # Skip if no URL or no audio
+        if not url or f.get('acodec', 'none') == 'none':
+            continue
+        score = (AUDIO_ONLY_BONUS if f.get('vcodec', 'none') == 'none' else 0) \
+            + EXT_BONUS.get(f.get('ext', ''), 0) + (f.get('abr', 0) or 0)
+        if best_score is None or score > best_score:
+            best_score = score
+            audio_url = url
+
+    # Largest thumbnail by pixel area
+    thumbnail = None
+    best_area = None
+    for t in video_info.get('thumbnails') or ():
+        area = (t.get('width') or 0) * (t.get('height') or 0)
+        if best_area is None or area > best_area:
+            best_area = area
+            thumbnail = t.get('url')
+
+    return StreamSelection(audio_url, thumbnail)
+
+class YouTubeAudioExtractor:
+    PROFILES = ("full", "fast")
+
+    def __init__(self, shared_cache: Optional[SharedResultCache] = None,
+                 query_index: Optional[SharedResultCache] = None, profile: str = EXTRACTION_PROFILE):
+        if profile not in self.PROFILES:
+            raise ValueError(f"Unknown extraction profile: {profile}")
+        self.profile = profile
         # yt-dlp configuration optimized for audio extraction without downloading
         self.ydl_opts = {
             'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best',
@@ -186,139 +1478,652 @@ class YouTubeAudioExtractor:
             'socket_timeout': 30,
             'retries': 3,
             'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'cachedir': YDL_CACHE_DIR or False,  # shared across workers and restarts
+        }
+        # Options never change, so build them once rather than per request
+        self.video_opts = self._profile_opts(profile)
+        # Stage one only needs the top video id, not its formats
+        self.search_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': True,
+            'noplaylist': True,
+            'socket_timeout': self.ydl_opts['socket_timeout'],
+            'retries': self.ydl_opts['retries'],
+            'user_agent': self.ydl_opts['user_agent'],
         }
+        self.ydl_pool = YoutubeDLPool(max_uses=YDL_POOL_MAX_USES, max_age=YDL_POOL_MAX_AGE)
+        self.cache = ResultCache(
+            max_entries=RESULT_CACHE_MAX_ENTRIES,
+            max_bytes=RESULT_CACHE_MAX_BYTES,
+            safety_margin=RESULT_CACHE_SAFETY_MARGIN,
+            default_ttl=RESULT_CACHE_DEFAULT_TTL
+        )
+        self.search_cache = ResultCache(
+            max_entries=SEARCH_CACHE_MAX_ENTRIES,
+            max_bytes=SEARCH_CACHE_MAX_BYTES,
+            safety_margin=0,
+            default_ttl=SEARCH_CACHE_TTL,
+            name="search"
+        )
+        self.shared_cache = shared_cache
+        # Persistent canonical query -> video id mappings, filled from successful searches
+        self.query_index = query_index
+        self.failures = NegativeCache(
+            max_entries=NEGATIVE_CACHE_MAX_ENTRIES,
+            ttls={
+                "no_results": NEGATIVE_CACHE_NO_RESULTS_TTL,
+                "unavailable": NEGATIVE_CACHE_UNAVAILABLE_TTL,
+                "transient": NEGATIVE_CACHE_TRANSIENT_TTL,
+            }
+        )
+        self.inflight = SingleFlight()
+        # Stale-while-revalidate: entries this close to expiry are served and refreshed in the background
+        self.refresh_window = RESULT_CACHE_REFRESH_WINDOW
+        self._refreshing = {}  # "video:<id>" / "search:<query>" -> background refresh task
+        self._refresh_task = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.proactive_refreshes = 0
+        self.executor = ExtractionExecutor(
+            max_workers=EXTRACTION_WORKERS,
+            max_queue=EXTRACTION_MAX_QUEUE,
+            retry_after=EXTRACTION_RETRY_AFTER,
+            backend=EXTRACTION_BACKEND
+        )
+    
+    def _profile_opts(self, profile: str) -> dict:
+        """yt-dlp options for a video extraction under the given profile
+        
+        "full" fetches everything yt-dlp offers. "fast" skips the DASH/HLS manifests, the
+        watch page and the extra player clients, since _format_response only needs one
+        audio-only format, the thumbnail list, the title and the duration.
+        
+        "fast" is experimental: no recording yet shows that its client and player_skip
+        combination still returns audio formats.
+        """
+        opts = self.ydl_opts.copy()
+        if profile == "fast":
+            opts.update({
+                'youtube_include_dash_manifest': False,
+                'youtube_include_hls_manifest': False,
+                'youtube_skip_dash_manifest': True,
+                'extractor_args': {
+                    'youtube': {
+                        'skip': ['dash', 'hls', 'translated_subs'],
+                        'player_client': list(EXTRACTION_FAST_CLIENTS),
+                        'player_skip': ['webpage', 'configs', 'initial_data'],
+                    }
+                },
+            })
+        return opts
     
     async def search_and_extract(self, query: str) -> dict:
         """Search YouTube and extract audio stream info from top result"""
-        try:
-            # Search for videos using yt-dlp
-            search_opts = self.ydl_opts.copy()
-            search_opts.update({
-                'quiet': True,
-                'no_warnings': True,
-                'default_search': 'ytsearch1:'  # Search and get top result
-            })
-            
-            # Run yt-dlp in a thread to avoid blocking
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None, 
-                functools.partial(self._extract_info, f"ytsearch1:{query}", search_opts)
-            )
-            
-            if not result:
-                raise HTTPException(status_code=404, detail="No results found for the given query")
-            
-            # Extract video info from search results
-            if 'entries' in result and len(result['entries']) > 0:
-                video_info = result['entries'][0]
-            else:
-                video_info = result
-            
-            if not video_info:
-                raise HTTPException(status_code=404, detail="No video found for the given query")
-            
-            # Extract the information we need
-            response_data = self._format_response(video_info)
-            return response_data
-            
-        except Exception as e:
-            logger.error(f"Error extracting audio info: {str(e)}")
-            if isinstance(e, HTTPException):
-                raise e
-            raise HTTPException(status_code=500, detail=f"Error extracting audio: {str(e)}")
+        result, _ = await self.lookup(query)
+        return result
     
-    def _extract_info(self, url: str, opts: dict) -> dict:
-        """Extract info using yt-dlp (runs in thread)"""
+    async def lookup(self, query: str) -> tuple:
+        """Resolve a query, URL or video id, returning (result, "direct" or "search")"""
         try:
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                return ydl.extract_info(url, download=False)
-        except Exception as e:
-            logger.error(f"yt-dlp extraction error: {str(e)}")
+            return await self._lookup(query)
+        except HTTPException as e:
+            LOOKUP_ERRORS.labels(NegativeCache.error_class(e)).inc()
+            raise
+    
+    async def cached_lookup(self, query: str) -> Optional[tuple]:
+        """Like lookup, but only from this worker's caches, the shared cache and the query index
+        
+        Returns None rather than running yt-dlp.
+        """
+        video_id, is_url = extract_video_id(query)
+        video_id = video_id or possible_video_id(query)
+        if video_id:
+            result = await self._cached_video(video_id)
+            if result is not None or is_url:
+                return (result, "direct") if result is not None else None
+        
+        cache_key = canonical_query(query)
+        hit = self.search_cache.get_entry(cache_key)
+        if hit is None:
+            hit = await self._indexed(cache_key)
+        if hit is None:
+            return None
+        result = await self._cached_video(hit[0]["video_id"])
+        return (result, "search") if result is not None else None
+    
+    async def _cached_video(self, video_id: str) -> Optional[dict]:
+        result = self.cache.get(video_id)
+        if result is None and self.shared_cache:
+            shared = await self.shared_cache.get(f"video:{video_id}")
+            if shared is not None:
+                result, expires_at = shared
+                result.setdefault("video_id", video_id)
+                self.cache.set(video_id, result, expires_at)
+        return result
+    
+    async def _lookup(self, query: str) -> tuple:
+        video_id, is_url = extract_video_id(query)
+        if video_id:
+            try:
+                return await self.extract_video(video_id), "direct"
+            except HTTPException as e:
+                # Something that merely looks like an id may still be a search term
+                if is_url or e.status_code == 503:
+                    raise
+            return await self._search_and_extract(query), "search"
+        
+        candidate = possible_video_id(query)
+        if candidate is None:
+            return await self._search_and_extract(query), "search"
+        # Usually a search, so don't make it wait for the id extraction to fail first
+        search = asyncio.create_task(self._search_and_extract(query))
+        search.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            try:
+                return await self.extract_video(candidate), "direct"
+            except HTTPException as e:
+                if e.status_code == 503:
+                    raise
+            return await search, "search"
+        finally:
+            search.cancel()
+    
+    async def _search_and_extract(self, query: str) -> dict:
+        cache_key = canonical_query(query)
+        
+        # Stage one: query -> video id, answered from the search cache when possible
+        hit = self.search_cache.get_entry(cache_key)
+        if hit is not None:
+            mapping, expires_at = hit
+            video_id = mapping["video_id"]
+            self._maybe_refresh("search", cache_key, expires_at)
+        else:
+            # Queries that just failed fail again without another search
+            failure = self.failures.get(f"query:{cache_key}")
+            if failure is not None:
+                raise failure
+            # Identical concurrent lookups share a single search
+            video_id = await self.inflight.do(
+                f"query:{cache_key}",
+                functools.partial(self._resolve_search, query, cache_key)
+            )
+        
+        # Stage two: video id -> audio stream, shared by every query that finds this video
+        try:
+            return await self.extract_video(video_id)
+        except HTTPException as e:
+            # Don't keep answering this query with a removed or blocked video
+            if self.failures.classify(e) == "unavailable":
+                self.search_cache.pop(cache_key)
+                if self.query_index:
+                    self.query_index.delete(cache_key)
+            raise
+    
+    async def extract_video(self, video_id: str) -> dict:
+        """Extract audio stream info for a known video id"""
+        # Serve repeated videos straight from the cache, without a thread hop
+        cached = self.cache.get_entry(video_id)
+        if cached is not None:
+            result, expires_at = cached
+            self._maybe_refresh("video", video_id, expires_at)
+            return result
+        
+        failure = self.failures.get(f"video:{video_id}")
+        if failure is not None:
+            raise failure
+        
+        return await self.inflight.do(
+            f"video:{video_id}",
+            functools.partial(self._resolve_video, video_id)
+        )
+    
+    async def _indexed(self, cache_key: str) -> Optional[tuple]:
+        """Query index entry for cache_key, if its query still has that canonical key
+        
+        Entries written before a change to canonical_query are skipped rather than trusted.
+        """
+        if not self.query_index:
+            return None
+        indexed = await self.query_index.get(cache_key)
+        if indexed is None or canonical_query(indexed[0].get("query", "")) != cache_key:
+            return None
+        return indexed
+    
+    async def _resolve_search(self, query: str, cache_key: str, fresh_for: float = 0) -> str:
+        """Resolve a search cache miss through the query index or a flat yt-dlp search
+        
+        Index entries expiring within fresh_for seconds are skipped, so a refresh can't
+        pick up the same stale mapping.
+        """
+        # Any query with the same canonical key, from any worker, may have been resolved already
+        indexed = await self._indexed(cache_key)
+        if indexed is not None and indexed[1] - time.time() > fresh_for:
+            mapping, expires_at = indexed
+            self.search_cache.set(cache_key, mapping, min(expires_at, time.time() + SEARCH_CACHE_TTL))
+            return mapping["video_id"]
+        
+        try:
+            video_id = await self._run_extraction(
+                "_flat_search", f"ytsearch1:{query}", self.search_opts, phase="search"
+            )
+        except Exception as e:
+            error = self._extraction_failed(e)
+            self.failures.add(f"query:{cache_key}", error)
+            raise error
+        
+        # Keep the query as typed; searching for the canonical key would rank worse
+        mapping = {"video_id": video_id, "query": query}
+        self.search_cache.set(cache_key, mapping, time.time() + SEARCH_CACHE_TTL)
+        if self.query_index:
+            self.query_index.set(cache_key, mapping, time.time() + QUERY_INDEX_TTL)
+        return video_id
+    
+    async def _resolve_video(self, video_id: str, fresh_for: float = 0) -> dict:
+        """Resolve a result cache miss through the shared cache or a full yt-dlp extraction
+        
+        Shared entries expiring within fresh_for seconds are skipped, so a refresh can't
+        pick up the same stale result.
+        """
+        if self.shared_cache:
+            shared = await self.shared_cache.get(f"video:{video_id}")
+            if shared is not None and shared[1] - time.time() > fresh_for:
+                result, expires_at = shared
+                # Entries written before video_id was part of the result
+                result.setdefault("video_id", video_id)
+                self.cache.set(video_id, result, expires_at)
+                return result
+        
+        try:
+            response_data = await self._run_extraction(
+                "_extract_and_format", f"https://www.youtube.com/watch?v={video_id}", self.video_opts,
+                phase="resolve"
+            )
+        except Exception as e:
+            error = self._extraction_failed(e)
+            self.failures.add(f"video:{video_id}", error)
+            raise error
+        
+        expires_at = self.cache.expires_at(response_data)
+        self.cache.set(video_id, response_data, expires_at)
+        if self.shared_cache:
+            self.shared_cache.set(f"video:{video_id}", response_data, expires_at)
+        return response_data
+    
+    def _maybe_refresh(self, kind: str, key: str, expires_at: float):
+        """Start a background refresh when a cache hit is inside the refresh window"""
+        if self.refresh_window > 0 and expires_at - time.time() <= self.refresh_window:
+            self._start_refresh(kind, key)
+    
+    def _start_refresh(self, kind: str, key: str) -> bool:
+        """Refresh one entry in the background, at most once at a time per entry"""
+        name = f"{kind}:{key}"
+        if name in self._refreshing:
+            return False
+        self._refreshing[name] = asyncio.create_task(self._refresh(kind, key))
+        return True
+    
+    async def _refresh(self, kind: str, key: str):
+        # Runs in a copy of the triggering request's context; keep its timings out of that request
+        request_timings.set(None)
+        try:
+            # Share the single-flight key with foreground lookups, so a request that
+            # misses while the refresh runs waits on it instead of extracting again
+            if kind == "video":
+                await self.inflight.do(
+                    f"video:{key}",
+                    functools.partial(self._resolve_video, key, self.refresh_window)
+                )
+            else:
+                mapping = self.search_cache.peek(key) or {}
+                await self.inflight.do(
+                    f"query:{key}",
+                    functools.partial(self._resolve_search, mapping.get("query", key), key, self.refresh_window)
+                )
+            self.refreshes += 1
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.warning(f"Background refresh of {kind} {key} failed: {str(e)}")
+        finally:
+            self._refreshing.pop(f"{kind}:{key}", None)
+    
+    def start_refresh(self):
+        """Start proactively refreshing the hottest entries before they expire"""
+        if RESULT_REFRESH_INTERVAL > 0 and self.refresh_window > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop_refresh(self):
+        tasks = list(self._refreshing.values())
+        if self._refresh_task is not None:
+            tasks.append(self._refresh_task)
+            self._refresh_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(RESULT_REFRESH_INTERVAL)
+            # Anything that would enter the refresh window before the next pass is due now
+            within = self.refresh_window + RESULT_REFRESH_INTERVAL
+            for kind, cache in (("video", self.cache), ("search", self.search_cache)):
+                for key in cache.hot_expiring(within, RESULT_REFRESH_MIN_HITS, RESULT_REFRESH_MAX_PER_PASS):
+                    if self._start_refresh(kind, key):
+                        self.proactive_refreshes += 1
+    
+    def refresh_stats(self) -> dict:
+        return {
+            "window": self.refresh_window,
+            "in_flight": len(self._refreshing),
+            "completed": self.refreshes,
+            "failed": self.refresh_failures,
+            "proactive": self.proactive_refreshes,
+        }
+    
+    async def _run_extraction(self, method: str, *args, phase: Optional[str] = None):
+        """Run one of the blocking extraction methods on the extraction pool"""
+        if self.executor.backend == "process":
+            # The extractor itself can't be pickled, so workers use their own copy
+            return await self.executor.run(_extract_in_process, method, *args, phase=phase)
+        return await self.executor.run(getattr(self, method), *args, phase=phase)
+    
+    @staticmethod
+    def _extraction_failed(e: Exception) -> HTTPException:
+        """Log an extraction failure and turn it into the HTTPException to raise"""
+        logger.error(f"Error extracting audio info: {str(e)}")
+        if isinstance(e, HTTPException):
+            return e
+        if isinstance(e, ExtractionError):
+            return HTTPException(status_code=e.status_code, detail=e.detail)
+        return HTTPException(status_code=500, detail=f"Error extracting audio: {str(e)}")
+    
+    def _flat_search(self, url: str, opts: dict) -> str:
+        """Run a flat yt-dlp search and return the top video id (runs on the extraction pool)"""
+        result = self._extract_info(url, opts)
+        entries = (result or {}).get('entries') or []
+        
+        if not entries or not entries[0] or not entries[0].get('id'):
+            raise HTTPException(status_code=404, detail="No results found for the given query")
+        
+        return entries[0]['id']
+    
+    def _extract_and_format(self, url: str, opts: dict) -> dict:
+        """Run yt-dlp and format the result (runs on the extraction pool)"""
+        result = self._extract_info(url, opts)
+        
+        if not result:
+            raise HTTPException(status_code=404, detail="No results found for the given query")
+        
+        # Extract video info from search results
+        if 'entries' in result and len(result['entries']) > 0:
+            video_info = result['entries'][0]
+        else:
+            video_info = result
+        
+        if not video_info:
+            raise HTTPException(status_code=404, detail="No video found for the given query")
+        
+        # Extract the information we need
+        return self._format_response(video_info)
+    
+    @timed_phase("extract_info")
+    def _extract_info(self, url: str, opts: dict) -> dict:
+        """Extract info using a pooled yt-dlp instance (runs on the extraction pool)"""
+        try:
+            ydl = self.ydl_pool.get(opts)
+            return ydl.extract_info(url, download=False)
+        except Exception as e:
+            logger.error(f"yt-dlp extraction error: {str(e)}")
             raise e
     
+    @timed_phase("format")
     def _format_response(self, video_info: dict) -> dict:
         """Format the response data"""
         try:
-            # Get the best audio stream URL
-            audio_url = None
-            
-            # Look for audio formats
-            if 'formats' in video_info:
-                # Filter for audio-only formats or formats with audio
-                audio_formats = []
-                for f in video_info['formats']:
-                    url = f.get('url')
-                    acodec = f.get('acodec', 'none')
-                    vcodec = f.get('vcodec', 'none')
-                    
-                    # Skip if no URL or no audio
-                    if not url or acodec == 'none':
-                        continue
-                    
-                    # Accept any format with audio
-                    audio_formats.append(f)
-                
-                if audio_formats:
-                    # Sort by preference: 
-                    # 1. Audio-only formats (vcodec='none') 
-                    # 2. Higher audio bitrate
-                    # 3. Prefer m4a and webm over mp4
-                    def sort_key(f):
-                        vcodec = f.get('vcodec', 'none')
-                        abr = f.get('abr', 0) or 0
-                        ext = f.get('ext', '')
-                        
-                        # Prefer audio-only
-                        is_audio_only = 1000 if vcodec == 'none' else 0
-                        
-                        # Prefer certain extensions
-                        ext_bonus = 0
-                        if ext in ['m4a', 'webm']:
-                            ext_bonus = 100
-                        elif ext == 'mp4':
-                            ext_bonus = 50
-                        
-                        return is_audio_only + ext_bonus + abr
-                    
-                    audio_formats.sort(key=sort_key, reverse=True)
-                    best_format = audio_formats[0]
-                    audio_url = best_format.get('url')
+            selection = select_stream(video_info)
             
             # Fallback to the main URL if no specific audio format found
-            if not audio_url:
-                audio_url = video_info.get('url')
-            
+            audio_url = selection.audio_url or video_info.get('url')
             if not audio_url:
                 raise HTTPException(status_code=500, detail="Could not extract audio stream URL")
             
-            # Get thumbnail (prefer higher quality)
-            thumbnail = None
-            if 'thumbnails' in video_info and video_info['thumbnails']:
-                # Get the best quality thumbnail
-                thumbnails = video_info['thumbnails']
-                # Sort by resolution/quality
-                thumbnails.sort(key=lambda x: (x.get('width', 0) * x.get('height', 0)), reverse=True)
-                thumbnail = thumbnails[0].get('url')
-            
             # Get duration in seconds
             duration = video_info.get('duration', 0)
             if duration is None:
                 duration = 0
             
             return {
+                "video_id": video_info.get('id', ''),
                 "title": video_info.get('title', 'Unknown Title'),
                 "duration": int(duration),
                 "audio_url": audio_url,
-                "thumbnail": thumbnail or ""
+                "thumbnail": selection.thumbnail or ""
             }
             
         except Exception as e:
             logger.error(f"Error formatting response: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error formatting response: {str(e)}")
 
+class JobManager:
+    """Background lookups for the submit-then-poll job API
+
+    A job id is the URL-safe encoding of its query, so duplicate submissions land on
+    the same job. The worker that claims a job in the jobs collection runs it and records
+    the outcome there; other workers answer from that record instead of extracting again.
+    Without a collection, jobs are only shared within a worker.
+    """
+
+    def __init__(self, collection, retention: int, lease: int):
+        self.collection = collection
+        self.retention = retention
+        self.lease = lease
+        self._jobs = {}  # job_id -> asyncio.Task run by this worker
+        self._finished_at = {}  # job_id -> monotonic time
+        self._pending_writes = set()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.errors = 0
+
+    @staticmethod
+    def job_id(query: str) -> str:
+        return base64.urlsafe_b64encode(query.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def query_for(job_id: str) -> Optional[str]:
+        try:
+            padded = job_id + "=" * (-len(job_id) % 4)
+            return base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        except (ValueError, UnicodeError):
+            return None
+
+    @staticmethod
+    def describe_error(error: BaseException) -> tuple:
+        """(status_code, detail, headers) a failed job answers with"""
+        if isinstance(error, HTTPException):
+            return error.status_code, error.detail, error.headers
+        if isinstance(error, asyncio.CancelledError):
+            return 500, "Job was cancelled", None
+        return 500, "Internal server error occurred while processing the request", None
+
+    async def ensure_indexes(self):
+        """Let MongoDB drop job records once they expire"""
+        if self.collection is None:
+            return
+        try:
+            await self.collection.create_index("expiresAt", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Could not create jobs TTL index: {e}")
+
+    async def submit(self, query: str, on_done=None) -> Optional[dict]:
+        """Start a lookup for query unless one is already running or recently succeeded
+        
+        Returns None when this worker holds the job (see get), and on_done is then called
+        with its task, deduplicated or not. Returns the stored record instead when another
+        worker is running the job or has finished it. A failed job is only kept for its
+        pollers; submitting it again starts a new lookup, so errors are cached no longer
+        than the negative cache allows (503s not at all).
+        """
+        self._prune()
+        job_id = self.job_id(query)
+        task = self._jobs.get(job_id)
+        if task is not None and not self.failed(task):
+            self.deduplicated += 1
+        else:
+            record = await self._claim(job_id)
+            if record is not None:
+                self.deduplicated += 1
+                return record
+            self.submitted += 1
+            self._finished_at.pop(job_id, None)
+            task = asyncio.ensure_future(extractor.lookup(query))
+            self._jobs[job_id] = task
+            task.add_done_callback(functools.partial(self._finished, job_id))
+        if on_done is not None:
+            task.add_done_callback(on_done)
+        return None
+
+    def get(self, job_id: str) -> Optional[asyncio.Task]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def get_record(self, job_id: str) -> Optional[dict]:
+        """The job's live record in the jobs collection, if any"""
+        if self.collection is None:
+            return None
+        try:
+            return await self.collection.find_one({"_id": job_id, "expiresAt": {"$gt": datetime.utcnow()}})
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Job lookup failed: {e}")
+            return None
+
+    async def _claim(self, job_id: str) -> Optional[dict]:
+        """Mark the job pending for this worker; return the existing record if another holds it"""
+        if self.collection is None:
+            return None
+        now = datetime.utcnow()
+        try:
+            # Matches only a record that may be taken over; a live pending or done record
+            # makes the upsert collide on _id instead
+            await self.collection.update_one(
+                {"_id": job_id, "$or": [{"status": "failed"}, {"expiresAt": {"$lte": now}}]},
+                {
+                    "$set": {"status": "pending", "expiresAt": now + timedelta(seconds=self.lease)},
+                    "$unset": {"result": "", "lookup": "", "error": ""},
+                },
+                upsert=True
+            )
+            return None
+        except DuplicateKeyError:
+            record = await self.get_record(job_id)
+            # Expired in between: the next submission or poll claims it
+            return record or {"_id": job_id, "status": "pending"}
+        except Exception as e:
+            # Run it here rather than not at all
+            self.errors += 1
+            logger.warning(f"Could not claim job {job_id}: {e}")
+            return None
+
+    @staticmethod
+    def failed(task: asyncio.Task) -> bool:
+        return task.done() and (task.cancelled() or task.exception() is not None)
+
+    def _finished(self, job_id: str, task: asyncio.Task):
+        self._finished_at[job_id] = time.monotonic()
+        # Mark the exception as retrieved; pollers read it from the task later
+        error = task.exception() if not task.cancelled() else asyncio.CancelledError()
+        if self.collection is not None:
+            write = asyncio.create_task(self._store(job_id, task, error))
+            self._pending_writes.add(write)
+            write.add_done_callback(self._pending_writes.discard)
+
+    async def _store(self, job_id: str, task: asyncio.Task, error: Optional[BaseException]):
+        """Record a finished job for pollers on other workers"""
+        if error is None:
+            result, lookup = task.result()
+            update = {"status": "done", "result": result, "lookup": lookup}
+        else:
+            status_code, detail, headers = self.describe_error(error)
+            update = {"status": "failed", "error": {"status_code": status_code, "detail": detail, "headers": headers}}
+        update["expiresAt"] = datetime.utcnow() + timedelta(seconds=self.retention)
+        try:
+            await self.collection.update_one({"_id": job_id}, {"$set": update}, upsert=True)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Could not record job {job_id}: {e}")
+
+    async def flush(self):
+        """Wait for job records still being written"""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.retention
+        for job_id, finished_at in list(self._finished_at.items()):
+            if finished_at < cutoff:
+                del self._finished_at[job_id]
+                self._jobs.pop(job_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "shared": self.collection is not None,
+            "jobs": len(self._jobs),
+            "pending": len(self._jobs) - len(self._finished_at),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "errors": self.errors,
+        }
+
 # Initialize the extractor
-extractor = YouTubeAudioExtractor()
+extractor = YouTubeAudioExtractor(
+    shared_cache=SharedResultCache(db[SHARED_CACHE_COLLECTION]) if SHARED_CACHE_ENABLED else None,
+    query_index=SharedResultCache(db[QUERY_INDEX_COLLECTION], name="Query index") if QUERY_INDEX_ENABLED else None
+)
+
+def warm_ydl_cache(url: str = YDL_CACHE_WARM_URL) -> bool:
+    """Extract one video so the player JS and its solved signature functions land in YDL_CACHE_DIR
+
+    Called from the gunicorn master (preload_app), so workers forked afterwards, and workers
+    respawned after max_requests, start from a warm cache. Best effort: failures are logged.
+    """
+    if not url or not YDL_CACHE_DIR:
+        return False
+    os.makedirs(YDL_CACHE_DIR, exist_ok=True)
+    opts = dict(extractor.video_opts, socket_timeout=YDL_CACHE_WARM_TIMEOUT, retries=0)
+    start = time.monotonic()
+    try:
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            ydl.extract_info(url, download=False)
+    except Exception as e:
+        logger.warning(f"yt-dlp cache warm-up failed: {str(e)}")
+        return False
+    entries = sum(len(files) for _, _, files in os.walk(YDL_CACHE_DIR))
+    logger.info(f"yt-dlp cache warmed in {time.monotonic() - start:.1f}s ({entries} entries in {YDL_CACHE_DIR})")
+    return True
+
+job_manager = JobManager(db[JOBS_COLLECTION] if JOBS_SHARED else None, retention=JOB_RETENTION, lease=JOB_LEASE)
+
+# Pooled keep-alive client for /stream, created on first use
+relay_client: Optional[httpx.AsyncClient] = None
+
+# Upstream headers worth passing on to the listener
+RELAY_RESPONSE_HEADERS = (
+    "content-type", "content-length", "content-range", "content-encoding",
+    "accept-ranges", "last-modified", "etag"
+)
+
+def get_relay_client() -> httpx.AsyncClient:
+    global relay_client
+    if relay_client is None:
+        relay_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=RELAY_MAX_CONNECTIONS,
+                max_keepalive_connections=RELAY_MAX_KEEPALIVE
+            ),
+            timeout=httpx.Timeout(RELAY_TIMEOUT),
+            follow_redirects=True
+        )
+    return relay_client
 
 @app.get("/")
 async def root():
@@ -329,7 +2134,12 @@ async def root():
         "website": "https://www.radhaapi.me",
         "endpoints": {
             "get_audio": "/get-audio?query=your_search_query",
+            "get_audio_batch": "POST /get-audio/batch",
+            "websocket": "/ws",
+            "jobs": "POST /jobs?query=..., then GET /jobs/{job_id}?wait=20",
+            "stream": "/stream/{video_id}",
             "health": "/health",
+            "metrics": "/metrics",
             "docs": "/docs"
         },
         "authentication": {
@@ -341,15 +2151,72 @@ async def root():
         "status": "active"
     }
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics, merged across gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "radhaapi-youtube-audio"}
+    return {
+        "status": "healthy",
+        "service": "radhaapi-youtube-audio",
+        "extraction_profile": extractor.profile,
+        "executor": extractor.executor.stats(),
+        "ydl_pool": extractor.ydl_pool.stats(),
+        "ydl_cache": ydl_cache_stats.stats(),
+        "result_cache": extractor.cache.stats(),
+        "search_cache": extractor.search_cache.stats(),
+        "shared_cache": extractor.shared_cache.stats() if extractor.shared_cache else None,
+        "refresh": extractor.refresh_stats(),
+        "negative_cache": extractor.failures.stats(),
+        "inflight": extractor.inflight.stats(),
+        "query_index": extractor.query_index.stats() if extractor.query_index else None,
+        "api_key_cache": api_key_cache.stats(),
+        "usage_counter": usage_counter.stats(),
+        "api_logs": api_log_writer.stats(),
+        "jobs": job_manager.stats(),
+        "hot_tracks": hot_tracks.stats() if hot_tracks else None
+    }
+
+def lookup_log(user: dict, query: str, user_agent: str, ip_address: str) -> dict:
+    """Fields every youtubeapilogs document for a lookup carries"""
+    return {
+        "user": user["_id"],
+        "apiKey": user["apiKey"],
+        "query": query,
+        "userAgent": user_agent,
+        "ipAddress": ip_address,
+        "createdAt": datetime.now()
+    }
+
+def success_log(log: dict, result: dict, lookup: str) -> dict:
+    return {**log, "status": "success", "lookup": lookup, "videoId": result.get("video_id"), "response": result}
+
+def failure_log(log: dict, error_message: str) -> dict:
+    return {**log, "status": "failed", "errorMessage": error_message}
+
+def write_timed_log(doc: dict, timings: dict) -> dict:
+    """Queue a youtubeapilogs document carrying the request's timings; return the final breakdown"""
+    timings["total"] = time.perf_counter() - timings["_start"]
+    doc["timings"] = timing_breakdown(timings)
+    with phase_timer("log"):
+        api_log_writer.write(doc)
+    timings["total"] = time.perf_counter() - timings["_start"]
+    return timing_breakdown(timings)
 
 @app.get("/get-audio")
 async def get_audio(
     request: Request,
     query: str = Query(..., min_length=1, description="YouTube search query"),
+    debug: Optional[str] = Query(None, description='"timing" adds a per-phase latency breakdown'),
+    timings: dict = Depends(start_request_timing),
     user: dict = Depends(validate_api_key)
 ):
     """
@@ -357,13 +2224,17 @@ async def get_audio(
     
     Args:
         query: YouTube search query string
+        debug: "timing" to include the Server-Timing breakdown in the body
         
     Returns:
-        JSON response with title, duration, audio_url, and thumbnail
+        JSON response with title, duration, audio_url, and thumbnail, plus a
+        Server-Timing header (auth, cache, queue, search, resolve, log, total)
         
     Security:
         Requires valid API key in Authorization header: Bearer <API_KEY>
     """
+    user_agent = request.headers.get("user-agent", "unknown")
+    ip_address = request.client.host if request.client else "unknown"
     try:
         if not query or query.strip() == "":
             raise HTTPException(status_code=400, detail="Search query cannot be empty")
@@ -373,75 +2244,712 @@ async def get_audio(
         
         logger.info(f"Processing audio request for query: {query} from user: {user.get('username', 'unknown')}")
         
-        # Extract audio information
-        result = await extractor.search_and_extract(query)
+        # Extract audio information, skipping the search for URLs and video ids
+        result, lookup = await extractor.lookup(query)
         
         # Log the API usage
-        await db.youtubeapilogs.insert_one({
-            "user": user["_id"],
-            "apiKey": user["apiKey"],
-            "query": query,
-            "userAgent": request.headers.get("user-agent", "unknown"),
-            "ipAddress": request.client.host if request.client else "unknown",
-            "status": "success",
-            "response": result,
-            "createdAt": datetime.now()
-        })
+        breakdown = write_timed_log(
+            success_log(lookup_log(user, query, user_agent, ip_address), result, lookup), timings
+        )
         
         logger.info(f"Successfully extracted audio info for: {result.get('title', 'Unknown')} (User: {user.get('username', 'unknown')})")
         
+        content = {
+            "success": True,
+            "data": result,
+            "lookup": lookup
+        }
+        if debug == "timing":
+            content["timing"] = breakdown
         return JSONResponse(
             status_code=200,
-            content={
-                "success": True,
-                "data": result
-            }
+            content=content,
+            headers={"Server-Timing": server_timing_header(breakdown)}
         )
         
     except HTTPException as e:
         # Log failed attempts
-        await db.youtubeapilogs.insert_one({
-            "user": user["_id"],
-            "apiKey": user["apiKey"],
-            "query": query,
-            "userAgent": request.headers.get("user-agent", "unknown"),
-            "ipAddress": request.client.host if request.client else "unknown",
-            "status": "failed",
-            "errorMessage": e.detail,
-            "createdAt": datetime.now()
-        })
+        breakdown = write_timed_log(
+            failure_log(lookup_log(user, query, user_agent, ip_address), e.detail), timings
+        )
         
         logger.error(f"HTTP error for query '{query}': {e.detail}")
+        content = {
+            "success": False,
+            "error": e.detail,
+            "query": query
+        }
+        if debug == "timing":
+            content["timing"] = breakdown
         return JSONResponse(
             status_code=e.status_code,
-            content={
-                "success": False,
-                "error": e.detail,
-                "query": query
-            }
+            content=content,
+            headers={**(e.headers or {}), "Server-Timing": server_timing_header(breakdown)}
         )
     except Exception as e:
         # Log unexpected errors
-        await db.youtubeapilogs.insert_one({
-            "user": user["_id"],
-            "apiKey": user["apiKey"],
-            "query": query,
-            "userAgent": request.headers.get("user-agent", "unknown"),
-            "ipAddress": request.client.host if request.client else "unknown",
-            "status": "failed",
-            "errorMessage": str(e),
-            "createdAt": datetime.now()
-        })
+        breakdown = write_timed_log(
+            failure_log(lookup_log(user, query, user_agent, ip_address), str(e)), timings
+        )
         
         logger.error(f"Unexpected error for query '{query}': {str(e)}")
+        content = {
+            "success": False,
+            "error": "Internal server error occurred while processing the request",
+            "query": query
+        }
+        if debug == "timing":
+            content["timing"] = breakdown
         return JSONResponse(
             status_code=500,
-            content={
-                "success": False,
-                "error": "Internal server error occurred while processing the request",
-                "query": query
-            }
+            content=content,
+            headers={"Server-Timing": server_timing_header(breakdown)}
+        )
+
+async def lookup_and_log(user: dict, query: str, user_agent: str, ip_address: str) -> dict:
+    """Resolve one query for a multi-lookup client and queue its log, returning the result line"""
+    log = lookup_log(user, query, user_agent, ip_address)
+    try:
+        result, lookup = await extractor.lookup(query)
+    except HTTPException as e:
+        api_log_writer.write(failure_log(log, e.detail))
+        return {"query": query, "success": False, "error": e.detail, "status": e.status_code}
+    except Exception as e:
+        api_log_writer.write(failure_log(log, str(e)))
+        logger.error(f"Unexpected error for query '{query}': {str(e)}")
+        return {
+            "query": query,
+            "success": False,
+            "error": "Internal server error occurred while processing the request",
+            "status": 500
+        }
+    api_log_writer.write(success_log(log, result, lookup))
+    return {"query": query, "success": True, "data": result, "lookup": lookup}
+
+class BatchAudioRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUERIES, description="Search queries, URLs or video ids")
+    concurrency: int = Field(BATCH_DEFAULT_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY, description="Lookups to run at once")
+
+@app.post("/get-audio/batch")
+async def get_audio_batch(
+    request: Request,
+    batch: BatchAudioRequest,
+    user: dict = Depends(validate_api_key)
+):
+    """
+    Get YouTube audio stream information for many queries at once
+    
+    Args:
+        queries: List of search queries, URLs or video ids
+        concurrency: How many lookups to run at the same time
+        
+    Returns:
+        NDJSON stream, one line per query in completion order:
+        {"index", "query", "success", "data", "lookup"} or {"index", "query", "success", "error", "status"}
+        
+    Security:
+        Requires valid API key in Authorization header: Bearer <API_KEY>
+    """
+    queries = [query.strip() for query in batch.queries]
+    if any(not query for query in queries):
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "Search queries cannot be empty"}
+        )
+    
+    # validate_api_key counted one use; count the rest in the same batched write
+    if len(queries) > 1:
+        usage_counter.increment(user["_id"], len(queries) - 1)
+    
+    user_agent = request.headers.get("user-agent", "unknown")
+    ip_address = request.client.host if request.client else "unknown"
+    slots = asyncio.Semaphore(batch.concurrency)
+    
+    logger.info(f"Processing batch of {len(queries)} queries from user: {user.get('username', 'unknown')}")
+    
+    async def resolve(index: int, query: str) -> dict:
+        async with slots:
+            line = await lookup_and_log(user, query, user_agent, ip_address)
+            return {"index": index, **line}
+    
+    async def stream():
+        tasks = [asyncio.ensure_future(resolve(index, query)) for index, query in enumerate(queries)]
+        try:
+            # Send each track as soon as it is ready rather than in request order
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                yield json.dumps(line) + "\n"
+        finally:
+            # The client went away; stop the lookups nobody will read
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+class HotTrackStore:
+    """Size-capped local copies of the most requested tracks, shared by all workers on a host"""
+
+    MEDIA_TYPES = {
+        "m4a": "audio/mp4",
+        "webm": "audio/webm",
+        "mp4": "video/mp4",
+        "mp3": "audio/mpeg",
+        "bin": "application/octet-stream"
+    }
+    EXTENSIONS = {"audio/mp4": "m4a", "audio/webm": "webm", "video/mp4": "mp4", "audio/mpeg": "mp3"}
+    DOWNLOAD_CHUNK = 10 * 1024 * 1024  # googlevideo throttles unranged downloads, so fetch in ranges
+
+    def __init__(self, directory: str, max_bytes: int, max_file_bytes: int, threshold: int,
+                 window: int, scan_interval: int, per_scan: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.threshold = threshold
+        self.window = window
+        self.scan_interval = scan_interval
+        self.per_scan = per_scan
+        self._task = None
+        self.hits = 0
+        self.downloads = 0
+        self.evictions = 0
+        self.errors = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def find(self, video_id: str) -> Optional[tuple]:
+        """Return (path, media_type) for a stored track and mark it recently used"""
+        for ext, media_type in self.MEDIA_TYPES.items():
+            path = os.path.join(self.directory, f"{video_id}.{ext}")
+            try:
+                # mtime doubles as the LRU clock
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            self.hits += 1
+            return path, media_type
+        return None
+
+    async def ensure_indexes(self):
+        """The scan counts recent successful lookups per video"""
+        try:
+            await db.youtubeapilogs.create_index([("createdAt", 1), ("status", 1)])
+        except Exception as e:
+            logger.warning(f"Could not create hot track scan index: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.scan()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Hot track scan failed: {e}")
+            await asyncio.sleep(self.scan_interval)
+
+    def _try_lock(self, name: str, stale_after: float) -> bool:
+        """Cross-process lock file; only one worker per host scans or downloads at a time"""
+        path = os.path.join(self.directory, name)
+        try:
+            if time.time() - os.path.getmtime(path) > stale_after:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    async def scan(self):
+        """Download every track requested at least `threshold` times within the window"""
+        # The scan lock is left in place so other workers skip this interval
+        if not self._try_lock(".scan.lock", self.scan_interval):
+            return
+        since = datetime.now() - timedelta(seconds=self.window)
+        pipeline = [
+            {"$match": {"status": "success", "createdAt": {"$gte": since}, "videoId": {"$type": "string", "$ne": ""}}},
+            {"$group": {"_id": "$videoId", "requests": {"$sum": 1}}},
+            {"$match": {"requests": {"$gte": self.threshold}}},
+            {"$sort": {"requests": -1}},
+            {"$limit": self.per_scan}
+        ]
+        async for hot in db.youtubeapilogs.aggregate(pipeline):
+            if self.find(hot["_id"]) is None:
+                await self.download(hot["_id"])
+
+    async def download(self, video_id: str):
+        lock_name = f".{video_id}.lock"
+        if not self._try_lock(lock_name, 600):
+            return
+        tmp_path = os.path.join(self.directory, f".{video_id}.part")
+        try:
+            result = await extractor.extract_video(video_id)
+            client = get_relay_client()
+            headers = {"User-Agent": extractor.ydl_opts["user_agent"]}
+            size = None
+            received = 0
+            media_type = "application/octet-stream"
+            with open(tmp_path, "wb") as f:
+                while size is None or received < size:
+                    headers["Range"] = f"bytes={received}-{received + self.DOWNLOAD_CHUNK - 1}"
+                    async with client.stream("GET", result["audio_url"], headers=headers) as response:
+                        response.raise_for_status()
+                        media_type = response.headers.get("content-type", media_type).split(";")[0]
+                        content_range = response.headers.get("content-range", "")
+                        if "/" in content_range:
+                            size = int(content_range.rsplit("/", 1)[1])
+                        else:
+                            size = int(response.headers.get("content-length", 0))
+                        if size > self.max_file_bytes:
+                            logger.info(f"Not storing hot track {video_id}: {size} bytes is over the per-file cap")
+                            return
+                        async for chunk in response.aiter_bytes(RELAY_CHUNK_SIZE):
+                            f.write(chunk)
+                            received += len(chunk)
+                        if response.status_code == 200:
+                            # Upstream ignored the range and sent everything
+                            break
+            ext = self.EXTENSIONS.get(media_type, "bin")
+            os.replace(tmp_path, os.path.join(self.directory, f"{video_id}.{ext}"))
+            self.downloads += 1
+            logger.info(f"Stored hot track {video_id} ({received} bytes)")
+            self._evict()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Could not store hot track {video_id}: {e}")
+        finally:
+            for path in (tmp_path, os.path.join(self.directory, lock_name)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self):
+        """Remove least recently served tracks until the store fits its size cap"""
+        tracks = []
+        total = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                tracks.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        for _, size, path in sorted(tracks):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "downloads": self.downloads,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+hot_tracks = HotTrackStore(
+    HOT_TRACKS_DIR,
+    max_bytes=HOT_TRACKS_MAX_BYTES,
+    max_file_bytes=HOT_TRACKS_MAX_FILE_BYTES,
+    threshold=HOT_TRACKS_THRESHOLD,
+    window=HOT_TRACKS_WINDOW,
+    scan_interval=HOT_TRACKS_SCAN_INTERVAL,
+    per_scan=HOT_TRACKS_PER_SCAN
+) if HOT_TRACKS_ENABLED else None
+
+def parse_range(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single "bytes=start-end" range; returns (start, end) or None if unsatisfiable"""
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if not match.group(1):
+        # Suffix range: the last N bytes
+        length = int(match.group(2))
+        if length == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+def local_file_response(path: str, media_type: str, range_header: Optional[str]):
+    """Serve a stored track, honouring Range requests"""
+    if not range_header:
+        # FileResponse hands the file to the server's zero-copy send when it supports one
+        return FileResponse(path, media_type=media_type, headers={"Accept-Ranges": "bytes"})
+    
+    size = os.path.getsize(path)
+    byte_range = parse_range(range_header, size)
+    if byte_range is None:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    start, end = byte_range
+    
+    async def read_range():
+        async with await anyio.open_file(path, "rb") as f:
+            await f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await f.read(min(RELAY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    
+    return StreamingResponse(
+        read_range(),
+        status_code=206,
+        media_type=media_type,
+        headers={
+            "Accept-Ranges": "bytes",
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1)
+        }
+    )
+
+@app.get("/stream/{video_id}")
+async def stream_audio(
+    request: Request,
+    video_id: str,
+    user: dict = Depends(validate_api_key)
+):
+    """
+    Relay a video's audio stream through this server
+    
+    For clients that can't reach googlevideo directly or whose signed audio_url is
+    locked to our IP. Range requests are forwarded, so seeking returns 206 Partial Content.
+    
+    Security:
+        Requires valid API key in Authorization header: Bearer <API_KEY>
+    """
+    if not VIDEO_ID_PATTERN.match(video_id):
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "Invalid video id", "video_id": video_id}
+        )
+    
+    # Hot tracks are served from local disk without touching YouTube at all
+    if hot_tracks:
+        stored = hot_tracks.find(video_id)
+        if stored is not None:
+            path, media_type = stored
+            return local_file_response(path, media_type, request.headers.get("range"))
+    
+    try:
+        result = await extractor.extract_video(video_id)
+    except HTTPException as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"success": False, "error": e.detail, "video_id": video_id},
+            headers=e.headers
+        )
+    
+    headers = {"User-Agent": extractor.ydl_opts["user_agent"]}
+    if request.headers.get("range"):
+        headers["Range"] = request.headers["range"]
+    
+    client = get_relay_client()
+    try:
+        upstream = await client.send(
+            client.build_request("GET", result["audio_url"], headers=headers),
+            stream=True
         )
+    except httpx.HTTPError as e:
+        logger.error(f"Upstream request failed for {video_id}: {str(e)}")
+        return JSONResponse(
+            status_code=502,
+            content={"success": False, "error": "Could not reach the audio source", "video_id": video_id}
+        )
+    
+    if upstream.status_code not in (200, 206, 416):
+        await upstream.aclose()
+        logger.error(f"Upstream returned {upstream.status_code} for {video_id}")
+        return JSONResponse(
+            status_code=502,
+            content={"success": False, "error": "Audio source rejected the request", "video_id": video_id}
+        )
+    
+    logger.info(f"Relaying audio for {video_id} (User: {user.get('username', 'unknown')}, Range: {headers.get('Range', 'none')})")
+    
+    # Chunks are pulled from upstream only as fast as the listener reads them
+    return StreamingResponse(
+        upstream.aiter_raw(RELAY_CHUNK_SIZE),
+        status_code=upstream.status_code,
+        headers={
+            name: upstream.headers[name]
+            for name in RELAY_RESPONSE_HEADERS
+            if name in upstream.headers
+        },
+        background=BackgroundTask(upstream.aclose)
+    )
+
+def log_job(log: dict, task: asyncio.Task):
+    """Job done-callback queueing the submission's youtubeapilogs document"""
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is None:
+        result, lookup = task.result()
+        api_log_writer.write(success_log(log, result, lookup))
+    else:
+        api_log_writer.write(failure_log(log, getattr(error, "detail", str(error))))
+
+def job_done_response(job_id: str, result: dict, lookup: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "job_id": job_id,
+            "status": "done",
+            "data": result,
+            "lookup": lookup
+        }
+    )
+
+def job_pending_response(job_id: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "job_id": job_id,
+            "status": "pending",
+            "poll": f"/jobs/{job_id}"
+        },
+        headers={"Retry-After": str(JOB_RETRY_AFTER), "Location": f"/jobs/{job_id}"}
+    )
+
+def job_failed_response(job_id: str, status_code: int, detail: str, headers: Optional[dict]) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={
+            "success": False,
+            "job_id": job_id,
+            "status": "failed",
+            "error": detail
+        },
+        # e.g. Retry-After on a 503 from a full extraction queue
+        headers=headers
+    )
+
+def job_response(job_id: str, task: asyncio.Task) -> JSONResponse:
+    """Describe the current state of a job this worker is running"""
+    if not task.done():
+        return job_pending_response(job_id)
+    if not task.cancelled() and task.exception() is None:
+        return job_done_response(job_id, *task.result())
+    error = task.exception() if not task.cancelled() else asyncio.CancelledError()
+    return job_failed_response(job_id, *JobManager.describe_error(error))
+
+def job_record_response(job_id: str, record: dict) -> JSONResponse:
+    """Describe a job from its record in the jobs collection"""
+    if record["status"] == "done":
+        return job_done_response(job_id, record["result"], record["lookup"])
+    if record["status"] == "failed":
+        error = record["error"]
+        return job_failed_response(job_id, error["status_code"], error["detail"], error.get("headers"))
+    return job_pending_response(job_id)
+
+async def wait_for_record(job_id: str, record: dict, wait: float) -> dict:
+    """Long-poll a job another worker is running by re-reading its record"""
+    deadline = time.monotonic() + wait
+    while record["status"] == "pending" and time.monotonic() < deadline:
+        await asyncio.sleep(min(JOB_POLL_INTERVAL, deadline - time.monotonic()))
+        record = await job_manager.get_record(job_id) or record
+    return record
+
+@app.post("/jobs")
+async def submit_job(
+    request: Request,
+    query: str = Query(..., min_length=1, description="YouTube search query, URL or video id"),
+    user: dict = Depends(validate_api_key)
+):
+    """
+    Submit a lookup as a background job and return its id immediately
+    
+    Poll GET /jobs/{job_id} for the result. Submitting the same query again, on any worker,
+    returns the same job instead of starting another extraction.
+    
+    Security:
+        Requires valid API key in Authorization header: Bearer <API_KEY>
+    """
+    query = query.strip()
+    if not query:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "Search query cannot be empty", "query": query}
+        )
+    
+    log = lookup_log(
+        user, query, request.headers.get("user-agent", "unknown"), request.client.host if request.client else "unknown"
+    )
+    
+    job_id = JobManager.job_id(query)
+    record = await job_manager.submit(query, on_done=functools.partial(log_job, log))
+    if record is not None:
+        # Another worker is running it, or has the result; that worker logs the outcome
+        if record["status"] == "done":
+            api_log_writer.write(success_log(log, record["result"], record["lookup"]))
+        else:
+            api_log_writer.write({**log, "status": "pending", "jobId": job_id})
+        return job_record_response(job_id, record)
+    logger.info(f"Queued job {job_id} for query: {query} from user: {user.get('username', 'unknown')}")
+    return job_response(job_id, job_manager.get(job_id))
+
+@app.get("/jobs/{job_id}")
+async def get_job(
+    request: Request,
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to long-poll for the result"),
+    user: dict = Depends(check_api_key)
+):
+    """
+    Get the status of a job, optionally waiting up to `wait` seconds for it to finish
+    
+    Returns 200 with the result, 202 with Retry-After while pending, or the
+    lookup's error status if it failed. Any worker can answer, from the job's record in the
+    jobs collection. Polling does not count as an API key use, unless no worker holds the job
+    and the shared caches can't answer it, in which case the poll starts the lookup itself and
+    is counted and logged like POST /jobs.
+    
+    Security:
+        Requires valid API key in Authorization header: Bearer <API_KEY>
+    """
+    query = JobManager.query_for(job_id)
+    if not query:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "job_id": job_id, "error": "Job not found"}
+        )
+    
+    wait = min(wait, JOB_MAX_WAIT)
+    task = job_manager.get(job_id)
+    record = None
+    # Submitted on another worker, or resubmitted there since it failed here: answer from
+    # the job's record in the jobs collection
+    if task is None or JobManager.failed(task):
+        record = await job_manager.get_record(job_id)
+    if task is None:
+        if record is None:
+            # Expired, or never recorded: answer from the shared caches if we can
+            cached = await extractor.cached_lookup(query)
+            if cached is not None:
+                result, lookup = cached
+                return job_done_response(job_id, result, lookup)
+            # Otherwise this poll starts a real extraction, counted and logged like POST /jobs
+            log = lookup_log(
+                user, query, request.headers.get("user-agent", "unknown"), request.client.host if request.client else "unknown"
+            )
+            record = await job_manager.submit(query, on_done=functools.partial(log_job, log))
+            if record is None:
+                usage_counter.increment(user["_id"])
+                task = job_manager.get(job_id)
+    if record is not None:
+        return job_record_response(job_id, await wait_for_record(job_id, record, wait))
+    
+    if wait > 0 and not task.done():
+        await asyncio.wait({task}, timeout=wait)
+    
+    return job_response(job_id, task)
+
+@app.websocket("/ws")
+async def audio_websocket(websocket: WebSocket):
+    """
+    Persistent channel for bots making many lookups
+    
+    Authenticate once with "Authorization: Bearer <API_KEY>" on the handshake, then send
+    {"id": "<tag>", "query": "<search, URL or video id>"} messages. Each reply carries the same
+    id and arrives as soon as its lookup finishes, so replies can come back out of order.
+    """
+    # Header only: a query-string key would end up in the server's access log
+    api_key = None
+    authorization = websocket.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        api_key = authorization[7:].strip()
+    
+    try:
+        user = await authenticate_api_key(api_key)
+    except HTTPException as e:
+        # Closing before accept rejects the handshake
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    
+    await websocket.accept()
+    
+    user_agent = websocket.headers.get("user-agent", "unknown")
+    ip_address = websocket.client.host if websocket.client else "unknown"
+    authenticated_at = time.monotonic()
+    in_flight = set()
+    send_lock = asyncio.Lock()
+    
+    logger.info(f"WebSocket connected for user: {user.get('username', 'unknown')}")
+    
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+    
+    async def handle(tag, query: str):
+        line = await lookup_and_log(user, query, user_agent, ip_address)
+        try:
+            await send({"id": tag, **line})
+        except Exception:
+            # The connection closed while the lookup was running
+            pass
+    
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+                tag = message.get("id")
+                query = str(message.get("query") or "").strip()
+            except (ValueError, AttributeError):
+                await send({"id": None, "success": False, "error": "Messages must be JSON objects", "status": 400})
+                continue
+            
+            if not query:
+                await send({"id": tag, "success": False, "error": "Search query cannot be empty", "status": 400})
+                continue
+            
+            if len(in_flight) >= WS_MAX_IN_FLIGHT:
+                await send({"id": tag, "query": query, "success": False, "error": "Too many lookups in flight", "status": 429})
+                continue
+            
+            # Re-check the key now and then so blocking a key also ends long-lived connections
+            if time.monotonic() - authenticated_at > WS_REAUTH_INTERVAL:
+                try:
+                    user = await authenticate_api_key(api_key)
+                except HTTPException as e:
+                    await websocket.close(code=1008, reason=e.detail)
+                    return
+                authenticated_at = time.monotonic()
+            
+            usage_counter.increment(user["_id"])
+            task = asyncio.create_task(handle(tag, query))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+    except WebSocketDisconnect:
+        logger.info(f"WebSocket disconnected for user: {user.get('username', 'unknown')}")
+    finally:
+        for task in in_flight:
+            task.cancel()
 
 if __name__ == "__main__":
     # For local development
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for the /stream/{video_id} audio relay
+Uses a local stand-in HTTP server as the upstream instead of googlevideo, so it runs offline
+"""
+
+import asyncio
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+import main
+
+AUDIO = bytes(range(256)) * 4096  # 1 MiB of fake audio
+VIDEO_ID = "dQw4w9WgXcQ"
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    """Minimal googlevideo stand-in with byte range support"""
+
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        if range_header:
+            match = re.match(r"bytes=(\d+)-(\d*)", range_header)
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(AUDIO) - 1
+            if start >= len(AUDIO):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(AUDIO)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            end = min(end, len(AUDIO) - 1)
+            body = AUDIO[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(AUDIO)}")
+        else:
+            body = AUDIO
+            self.send_response(200)
+        self.send_header("Content-Type", "audio/webm")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), UpstreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def fetch(path: str, headers: dict = None) -> httpx.Response:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        return await client.get(path, headers=headers or {})
+
+def run_relay_checks():
+    server = start_upstream()
+    upstream_url = f"http://127.0.0.1:{server.server_address[1]}/videoplayback?expire=9999999999"
+
+    async def fake_extract_video(video_id):
+        return {"title": "Test", "duration": 1, "audio_url": upstream_url, "thumbnail": ""}
+
+    original_extract_video = main.extractor.extract_video
+    main.extractor.extract_video = fake_extract_video
+    main.app.dependency_overrides[main.validate_api_key] = lambda: {"_id": "test", "username": "test", "apiKey": "test"}
+
+    async def checks():
+        try:
+            # Whole file
+            response = await fetch(f"/stream/{VIDEO_ID}")
+            assert response.status_code == 200, response.status_code
+            assert response.content == AUDIO
+            assert response.headers["content-type"] == "audio/webm"
+            assert response.headers["accept-ranges"] == "bytes"
+            print("✅ Full download relayed")
+
+            # Range request
+            response = await fetch(f"/stream/{VIDEO_ID}", {"Range": "bytes=1000-1999"})
+            assert response.status_code == 206, response.status_code
+            assert response.content == AUDIO[1000:2000]
+            assert response.headers["content-range"] == f"bytes 1000-1999/{len(AUDIO)}"
+            assert response.headers["content-length"] == "1000"
+            print("✅ Range request relayed as 206")
+
+            # Open-ended range
+            response = await fetch(f"/stream/{VIDEO_ID}", {"Range": f"bytes={len(AUDIO) - 10}-"})
+            assert response.status_code == 206
+            assert response.content == AUDIO[-10:]
+            print("✅ Open-ended range relayed")
+
+            # Unsatisfiable range
+            response = await fetch(f"/stream/{VIDEO_ID}", {"Range": f"bytes={len(AUDIO) + 1}-"})
+            assert response.status_code == 416
+            print("✅ Unsatisfiable range passed through as 416")
+
+            # Invalid id
+            response = await fetch("/stream/not-a-valid-id")
+            assert response.status_code == 400
+            print("✅ Invalid video id rejected")
+        finally:
+            if main.relay_client is not None:
+                await main.relay_client.aclose()
+                main.relay_client = None
+
+    try:
+        asyncio.run(checks())
+    finally:
+        main.extractor.extract_video = original_extract_video
+        main.app.dependency_overrides.clear()
+        server.shutdown()
+
+def test_stream_relay():
+    run_relay_checks()
+
+if __name__ == "__main__":
+    print("🧪 /stream relay test against a local upstream")
+    print("=" * 60)
+    run_relay_checks()
+    print("\n🏁 Test completed!")